@@ -0,0 +1,160 @@
+import time
+import asyncio
+import itertools
+import threading
+import contextvars
+
+# Finished handles kept for reporting
+HISTORY_SIZE = 10
+
+# Handle of the prompt being run, copied into tool threads by asyncio.to_thread
+current_handle = contextvars.ContextVar("current_handle", default=None)
+
+#
+# True when the prompt of the calling agent task or tool thread is cancelled.
+# Tools running in a thread are not interrupted by cancel, they check this between steps.
+#
+def cancel_requested()->bool:
+	handle = current_handle.get()
+	return handle is not None and handle.cancel_requested
+
+# Class AGENT_HANDLE : submitted agent prompt
+# status : queued, running, done, cancelled, error
+class AGENT_HANDLE:
+	def __init__(self, id, prompt):
+		self.id = id
+		self.prompt = prompt
+		self.future = None
+		self.status = "queued"
+		self.error = ""
+		self.cancel_requested = False
+
+		self.submitted = time.monotonic()
+		self.started = None
+		self.ended = None
+
+	#
+	# Cancel prompt, a running agent is interrupted at its next await, tool threads see cancel_requested()
+	#
+	def cancel(self):
+		self.cancel_requested = True
+		if self.future:
+			self.future.cancel()
+
+	def done(self)->bool:
+		return self.future is not None and self.future.done()
+
+	#
+	# Wait for the prompt to finish, returns False when cancelled, failed or on timeout
+	#
+	def wait(self, timeout=None)->bool:
+		try:
+			self.future.result(timeout)
+			return True
+		except Exception:
+			return False
+
+	def to_dict(self)->dict:
+		return {
+			"id" : self.id,
+			"prompt" : self.prompt,
+			"status" : self.status,
+			"error" : self.error,
+			"queue_time" : round((self.started or time.monotonic()) - self.submitted, 3),
+			"run_time" : round((self.ended or time.monotonic()) - self.started, 3) if self.started else None,
+		}
+
+# Class AGENT_RUNTIME : long-lived runtime of the agent
+# One event loop in a single thread is kept for all prompts, so LLM clients and their pooled http connections
+# are reused instead of being set up and torn down per prompt.
+# submit() returns a handle, prompts run one at a time in submission order and queue up behind the running one.
+# run(prompt) is the coroutine running the agent for one prompt.
+#
+class AGENT_RUNTIME:
+	def __init__(self, run):
+		self.run = run
+		self.ids = itertools.count(1)
+
+		self.handles = []
+		self.history = []
+		self.counters = { "submitted" : 0, "done" : 0, "cancelled" : 0, "errors" : 0 }
+
+		self.loop = asyncio.new_event_loop()
+		# Serializes prompts (created on the loop)
+		self.lock = None
+		threading.Thread(target=self.run_loop, daemon=True).start()
+
+	#
+	# Event loop thread
+	#
+	def run_loop(self):
+		asyncio.set_event_loop(self.loop)
+		self.lock = asyncio.Lock()
+		print("Agent runtime event loop started.")
+		self.loop.run_forever()
+		print("Agent runtime event loop stopped.")
+
+	#
+	# Submit prompt, returns handle
+	#
+	def submit(self, prompt)->AGENT_HANDLE:
+		handle = AGENT_HANDLE(next(self.ids), prompt)
+		self.handles.append(handle)
+		self.counters["submitted"] += 1
+
+		handle.future = asyncio.run_coroutine_threadsafe(self.execute(handle), self.loop)
+		handle.future.add_done_callback(lambda future: self.finished(handle))
+		return handle
+
+	#
+	# Coroutine : run prompt when previous prompts are done
+	#
+	async def execute(self, handle):
+		async with self.lock:
+			current_handle.set(handle)
+			handle.status = "running"
+			handle.started = time.monotonic()
+			try:
+				await self.run(handle.prompt)
+				handle.status = "done"
+			except asyncio.CancelledError:
+				print("Agent interrupted!!!")
+				raise
+			except Exception as e:
+				handle.status = "error"
+				handle.error = str(e)
+				print("Agent error : ", e)
+				raise
+
+	#
+	# Bookkeeping of finished (or cancelled while queued) handle
+	#
+	def finished(self, handle):
+		handle.ended = time.monotonic()
+		if handle.future.cancelled():
+			handle.status = "cancelled"
+		self.counters[{"done" : "done", "cancelled" : "cancelled"}.get(handle.status, "errors")] += 1
+
+		if handle in self.handles:
+			self.handles.remove(handle)
+		self.history.append(handle)
+		del self.history[:-HISTORY_SIZE]
+
+	#
+	# Running or queued prompts
+	#
+	def running(self)->bool:
+		return len(self.handles) > 0
+
+	#
+	# Cancel all running and queued prompts
+	#
+	def cancel_all(self):
+		for handle in list(self.handles):
+			handle.cancel()
+
+	def stats(self)->dict:
+		stats = dict(self.counters)
+		stats["active"] = [handle.to_dict() for handle in list(self.handles)]
+		stats["recent"] = [handle.to_dict() for handle in self.history]
+		return stats
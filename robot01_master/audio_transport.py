@@ -0,0 +1,114 @@
+import time
+import threading
+import numpy as np
+
+# Playback sample rate of the device (16khz mono)
+SAMPLE_RATE = 16000
+# Max audio ahead of playback buffered on the device (seconds).
+# Device ring buffer (tcp2audio) holds about 4 seconds
+PLAYBACK_LEAD = 0.5
+
+# Samples per frame sent over TCP (PCM16le, 2 bytes per sample)
+FRAME_SAMPLES = 1024
+# Initial buffer size in samples (10 seconds at 16khz), grows when needed
+BUFFER_SAMPLES = 160000
+# Empty packet (1024 bytes) used to flush the device buffer
+SILENCE_PACKET = bytes(1024)
+
+# Class PCM16_BUFFER : preallocated PCM16le output buffer
+# Float audio (16khz mono f32le) is converted in place into the buffer,
+# frames are memoryview slices of it so sending does not copy per frame.
+#
+class PCM16_BUFFER:
+	def __init__(self, samples=BUFFER_SAMPLES, frame_samples=FRAME_SAMPLES):
+		self.frame_samples = frame_samples
+		self.allocate(samples)
+
+	#
+	# (Re)allocate buffer and byte view
+	#
+	def allocate(self, samples):
+		self.buffer = np.empty(samples, dtype="<i2")
+		self.view = memoryview(self.buffer).cast("B")
+
+	#
+	# Convert float audio into the buffer, returns number of samples
+	#
+	def convert(self, audio)->int:
+		samples = audio.shape[0]
+		if samples > self.buffer.shape[0]:
+			# Amortized growth, long utterances are rare
+			self.allocate(max(samples, self.buffer.shape[0] * 2))
+
+		np.multiply(audio, 32767, out=self.buffer[:samples], casting="unsafe")
+		return samples
+
+	#
+	# Frames (memoryview, no copy) of the converted samples
+	#
+	def frames(self, samples):
+		frame_bytes = self.frame_samples * 2
+		for start in range(0, samples * 2, frame_bytes):
+			yield self.view[start:min(start + frame_bytes, samples * 2)]
+
+# Class AUDIO_PACER : real-time pacing of audio sent to the device
+# Tracks samples sent against the playback clock to know how much audio is buffered on the device.
+# Sends are held back when more than lead seconds are buffered.
+# playing (threading.Event) is set when playback starts and cleared when the device buffer is drained.
+#
+class AUDIO_PACER:
+	def __init__(self, sample_rate=SAMPLE_RATE, lead=PLAYBACK_LEAD):
+		self.sample_rate = sample_rate
+		self.lead = lead
+
+		self.playing = threading.Event()
+		self.play_start = 0
+		self.samples_sent = 0
+
+	#
+	# Samples buffered on the device (sent, not yet played)
+	#
+	def buffered_samples(self)->int:
+		if not self.playing.is_set():
+			return 0
+		played = (time.monotonic() - self.play_start) * self.sample_rate
+		return max(int(self.samples_sent - played), 0)
+
+	#
+	# Seconds until the device buffer is drained
+	#
+	def remaining(self)->float:
+		return self.buffered_samples() / self.sample_rate
+
+	#
+	# Wait until samples can be sent without exceeding the lead
+	#
+	def wait(self, samples):
+		if not self.playing.is_set() or self.buffered_samples() == 0:
+			# (Re)start playback clock, device buffer ran empty
+			self.play_start = time.monotonic()
+			self.samples_sent = 0
+			self.playing.set()
+		else:
+			excess = self.buffered_samples() + samples - self.lead * self.sample_rate
+			if excess > 0:
+				time.sleep(excess / self.sample_rate)
+
+	#
+	# Account sent samples
+	#
+	def sent(self, samples):
+		self.samples_sent += samples
+
+	#
+	# Playback finished (device buffer drained)
+	#
+	def finish(self):
+		self.playing.clear()
+		self.samples_sent = 0
+
+	#
+	# Statistics
+	#
+	def stats(self)->dict:
+		return { "playing" : self.playing.is_set(), "buffered_samples" : self.buffered_samples(), "lead" : self.lead }
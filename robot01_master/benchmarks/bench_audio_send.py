@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Micro-benchmark : samples per second through the output send path
+# Previous path (new int16 array per utterance, tobytes() per frame) vs PCM16_BUFFER (in place, memoryview frames)
+# Sends to a local TCP sink that discards the data.
+#
+# Run from robot01_master : python benchmarks/bench_audio_send.py [utterances] [seconds_per_utterance]
+#
+import os
+import sys
+import time
+import socket
+import threading
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from audio_transport import PCM16_BUFFER
+
+SAMPLE_RATE = 16000
+
+#
+# TCP sink, reads and discards
+#
+def start_sink()-> int:
+	server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	server.bind(("127.0.0.1", 0))
+	server.listen(2)
+
+	def sink():
+		while True:
+			conn, addr = server.accept()
+			threading.Thread(target=drain, args=[conn], daemon=True).start()
+
+	def drain(conn):
+		buffer = bytearray(65536)
+		while conn.recv_into(buffer):
+			pass
+
+	threading.Thread(target=sink, daemon=True).start()
+	return server.getsockname()[1]
+
+def send_previous(sock, utterances):
+	for audio in utterances:
+		audio = np.asarray(audio * 32767, dtype="<i2")
+		for x in range(0, audio.shape[0], 1024):
+			sock.sendall(audio[x:x + 1024].tobytes())
+
+def send_buffer(sock, utterances):
+	pcm = PCM16_BUFFER()
+	for audio in utterances:
+		samples = pcm.convert(audio)
+		for frame in pcm.frames(samples):
+			sock.sendall(frame)
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+	seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+	rng = np.random.default_rng(0)
+	utterances = [rng.uniform(-0.5, 0.5, int(SAMPLE_RATE * seconds)).astype(np.float32) for i in range(count)]
+	total = sum(audio.shape[0] for audio in utterances)
+
+	port = start_sink()
+	print(f"{count} utterances of {seconds}s, {total} samples")
+
+	for name, send in [("previous", send_previous), ("pcm16 buffer", send_buffer)]:
+		sock = socket.create_connection(("127.0.0.1", port))
+		start = time.perf_counter()
+		send(sock, utterances)
+		elapsed = time.perf_counter() - start
+		sock.close()
+		print(f"{name:<14} {elapsed:7.3f}s  {total / elapsed / 1e6:7.2f} Msamples/s  ({total / elapsed / SAMPLE_RATE:7.0f}x real-time)")
+
+if __name__ == '__main__':
+	main()
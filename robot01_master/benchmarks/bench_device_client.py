@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Benchmark : thread-per-call requests.get vs async DEVICE_CLIENT
+# Fires calls at a fixed rate against a local stub http server (mimics ESP32 endpoints)
+#
+# Run from robot01_master : python benchmarks/bench_device_client.py [rate] [seconds]
+#
+import os
+import sys
+import time
+import threading
+import statistics
+import socket
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from device_client import DEVICE_CLIENT
+
+# Simulated device response time (seconds)
+STUB_DELAY = 0.02
+
+class StubHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+
+	# Headers and body are written separately, avoid Nagle delays on keep-alive connections
+	def setup(self):
+		super().setup()
+		self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+	def do_GET(self):
+		time.sleep(STUB_DELAY)
+		body = b'{"status":"ok"}'
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+#
+# Fire calls at rate, returns latencies and peak thread count
+#
+def run_paced(fire, rate, seconds):
+	latencies = []
+	lock = threading.Lock()
+	done = threading.Event()
+	total = rate * seconds
+	peak_threads = threading.active_count()
+
+	def record(start):
+		with lock:
+			latencies.append(time.perf_counter() - start)
+			if len(latencies) == total:
+				done.set()
+
+	interval = 1.0 / rate
+	begin = time.perf_counter()
+	for n in range(total):
+		next_call = begin + n * interval
+		delay = next_call - time.perf_counter()
+		if delay > 0:
+			time.sleep(delay)
+		fire(record)
+		peak_threads = max(peak_threads, threading.active_count())
+
+	done.wait(seconds + 10)
+	return latencies, peak_threads, time.perf_counter() - begin
+
+def report(name, latencies, peak_threads, elapsed):
+	latencies = sorted(latencies)
+	p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+	print(f"{name:<20} calls {len(latencies):>5}  wall {elapsed:6.2f}s  "
+		f"mean {statistics.mean(latencies) * 1000:7.2f}ms  p95 {p95 * 1000:7.2f}ms  peak threads {peak_threads}")
+
+def main():
+	rate = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+	server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	url = "http://127.0.0.1:" + str(server.server_address[1]) + "/volume?power=30"
+
+	print(f"Rate {rate} calls/s for {seconds}s, stub delay {STUB_DELAY * 1000:.0f}ms")
+
+	# Thread per call (previous design)
+	def thread_fire(record):
+		def call(start):
+			try:
+				requests.get(url, timeout=2)
+			except Exception:
+				pass
+			record(start)
+		threading.Thread(target=call, args=[time.perf_counter()]).start()
+
+	report("thread-per-call", *run_paced(thread_fire, rate, seconds))
+
+	# Async device client
+	client = DEVICE_CLIENT()
+
+	def async_fire(record):
+		start = time.perf_counter()
+		client.submit(url).add_done_callback(lambda future: record(start))
+
+	report("async client", *run_paced(async_fire, rate, seconds))
+	client.close()
+	server.shutdown()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Benchmark : accuracy and latency of emotion detection on labelled sentence fixtures
+# Classifier (local lexicon) always, LLM (LLM_EXPRESSION_MODEL via ollama) with --llm
+#	emotion_sentences.tsv : development set, written together with the lexicon
+#	emotion_heldout.tsv : held-out set of robot responses (answers, confirmations), not used to build the lexicon
+#
+# Run from robot01_master : python benchmarks/bench_emotion.py [--llm] [fixture.tsv]
+#
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from emotion import EMOTION_CLASSIFIER, EMOTIONS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = [os.path.join(FIXTURE_DIR, "emotion_heldout.tsv"), os.path.join(FIXTURE_DIR, "emotion_sentences.tsv")]
+
+#
+# Fixture lines : label <tab> sentence
+#
+def read_fixture(path)->list:
+	samples = []
+	with open(path) as f:
+		for line in f:
+			if line.strip():
+				label, sentence = line.rstrip("\n").split("\t", 1)
+				samples.append((label, sentence))
+	return samples
+
+def run(name, classify, samples):
+	correct = 0
+	latencies = []
+	confusions = []
+	for label, sentence in samples:
+		start = time.perf_counter()
+		emotion = classify(sentence)
+		latencies.append(time.perf_counter() - start)
+		if emotion == label:
+			correct += 1
+		else:
+			confusions.append((label, emotion, sentence))
+
+	print(f"{name:<12} accuracy {correct / len(samples):6.1%}  mean {statistics.mean(latencies) * 1000:8.3f}ms  max {max(latencies) * 1000:8.3f}ms")
+	for label, emotion, sentence in confusions:
+		print(f"  expected {label:<12} got {emotion:<12} {sentence}")
+
+def llm_classify(sentence)->str:
+	import ollama
+	from robot01 import LLM_EXPRESSION_MODEL
+
+	prompt = """Try to match the emotion or expression in the text as much as possible with of one the following words:
+	sad, happy, excited, difficult, love, like, dislike, interesting, relieved, embarrassed, fear or neutral. 
+	Your results should only be that word, no explanation.
+	The text is : """ + sentence
+
+	response = ollama.chat(model = LLM_EXPRESSION_MODEL, keep_alive = -1, messages=[{'role': 'user', 'content': prompt}])
+	response = response['message']['content'].lower()
+	for emotion in sorted(EMOTIONS, key=len, reverse=True):
+		if emotion in response:
+			return emotion
+	return response
+
+def main():
+	args = [arg for arg in sys.argv[1:] if arg != "--llm"]
+	classifier = EMOTION_CLASSIFIER()
+
+	for path in (args or FIXTURES):
+		samples = read_fixture(path)
+		print(f"{os.path.basename(path)} : {len(samples)} labelled sentences")
+
+		run("classifier", classifier.classify, samples)
+
+		if "--llm" in sys.argv:
+			run("llm", llm_classify, samples)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Benchmark : real-time factor (processing time / audio duration) of the STT engines
+# Fixtures are 16khz mono 16-bit WAV files, by default benchmarks/fixtures/*.wav
+#
+# Run from robot01_master : python benchmarks/bench_stt_engines.py [fixture_dir] [engine ...]
+#
+import os
+import sys
+import glob
+import time
+import wave
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from stt_engines import STT_ENGINES, SAMPLE_RATE
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+#
+# Read 16khz mono 16-bit WAV as float32
+#
+def read_wav(path)->np.ndarray:
+	with wave.open(path, "rb") as f:
+		if f.getframerate() != SAMPLE_RATE or f.getnchannels() != 1 or f.getsampwidth() != 2:
+			raise ValueError(path + " is not 16khz mono 16-bit")
+		frames = f.readframes(f.getnframes())
+
+	return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+
+def main():
+	fixture_dir = sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR
+	engines = sys.argv[2:] if len(sys.argv) > 2 else list(STT_ENGINES)
+
+	fixtures = [(os.path.basename(path), read_wav(path)) for path in sorted(glob.glob(os.path.join(fixture_dir, "*.wav")))]
+	if not fixtures:
+		print("No WAV fixtures found in " + fixture_dir)
+		return
+
+	audio_seconds = sum(audio.shape[0] for name, audio in fixtures) / SAMPLE_RATE
+	print(f"{len(fixtures)} fixtures, {audio_seconds:.1f}s of audio")
+
+	for name in engines:
+		engine = STT_ENGINES[name]()
+		try:
+			start = time.perf_counter()
+			engine.load()
+			load_seconds = time.perf_counter() - start
+
+			# Warm-up run, not measured
+			engine.transcribe(fixtures[0][1])
+		except Exception as e:
+			print(f"{name:<14} not available : {e}")
+			continue
+
+		start = time.perf_counter()
+		for fixture, audio in fixtures:
+			text = engine.transcribe(audio)
+			print(f"  {name:<14} {fixture:<24} {text}")
+		elapsed = time.perf_counter() - start
+
+		print(f"{name:<14} load {load_seconds:6.1f}s  transcribe {elapsed:6.2f}s  RTF {elapsed / audio_seconds:.3f}")
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,297 @@
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from notifications import NOTIFICATION
+
+# Body actions (see robot01 bodyControl.h)
+ACTION_STOP = 12
+ACTION_TURN = 10
+ACTION_WALK_FORWARD = 14
+
+# Priority classes, lower runs first
+PRIORITY_STOP = 0
+PRIORITY_LOCOMOTION = 1
+PRIORITY_GESTURE = 2
+
+# Locomotion actions : turn, back and forth, walk forward, walk backward. Everything else is a gesture
+LOCOMOTION_ACTIONS = {10, 13, 14, 15}
+
+# Actions completed by a robot notification : action -> notification kind
+NOTIFIED_ACTIONS = { ACTION_WALK_FORWARD : "walking", ACTION_TURN : "turn" }
+# Max wait for the completion notification (seconds, base + per step/degree for walking)
+NOTIFY_TIMEOUT = { ACTION_WALK_FORWARD : 30, ACTION_TURN : 60 }
+WALK_STEP_TIMEOUT = 2
+
+# Time an action occupies the body when no notification is expected (seconds)
+ACTION_TIME = 1
+# Max pending gestures, oldest are dropped (expressive moves are not worth waiting for)
+MAX_PENDING_GESTURES = 6
+
+# Class BODY_TASK : scheduled body action with its completion future
+# The future result is the completion notification for notified actions (None on timeout),
+# "done" for other actions, "merged" / "cancelled" / "stopped" when not executed.
+class BODY_TASK:
+	def __init__(self, action, direction, value, priority):
+		self.action = action
+		self.direction = direction
+		self.value = value
+		self.priority = priority
+		self.future = Future()
+		# Set by stop
+		self.stopped = False
+
+	def url(self)->str:
+		return "/bodyaction?action=" + str(self.action) + "&direction=" + str(self.direction) + "&value=" + str(self.value)
+
+	def timeout(self)->float:
+		if self.action == ACTION_WALK_FORWARD:
+			return NOTIFY_TIMEOUT[self.action] + WALK_STEP_TIMEOUT * self.value
+		return NOTIFY_TIMEOUT.get(self.action, ACTION_TIME)
+
+	def resolve(self, result):
+		if not self.future.done():
+			self.future.set_result(result)
+
+# Class BODY_SCHEDULER : priority body action scheduler
+#	stop > locomotion > gestures. A stop is sent immediately and clears everything pending.
+#	A pending gesture on the same joint (action) is replaced by the newer one (merge).
+#	Locomotion preempts a running gesture (stop first), gestures wait until locomotion is done.
+#	Walk and turn complete on the robot notification (see notifications.NOTIFICATION_BUS).
+# send(url) sends the action to the robot, returns False when it could not be sent.
+class BODY_SCHEDULER:
+	def __init__(self, send, notifications=None):
+		self.send = send
+		self.notifications = notifications
+
+		self.cond = threading.Condition()
+		self.pending = []
+		self.sequence = itertools.count()
+		self.enabled = True
+		self.preempt = False
+
+		# Running task, its completion subscription and end time when not notified
+		self.active = None
+		self.active_subscription = None
+		self.active_until = 0
+
+		# Serializes sends to the robot (worker and stop)
+		self.send_lock = threading.Lock()
+
+		# Called with the task when locomotion is sent (robot moves)
+		self.listeners = []
+
+		self.counters = { "scheduled" : 0, "sent" : 0, "merged" : 0, "preempted" : 0, "dropped" : 0, "stops" : 0 }
+
+		threading.Thread(target=self.worker, daemon=True).start()
+
+	#
+	# Priority class of action
+	#
+	@staticmethod
+	def priority(action)->int:
+		if action == ACTION_STOP:
+			return PRIORITY_STOP
+		if action in LOCOMOTION_ACTIONS:
+			return PRIORITY_LOCOMOTION
+		return PRIORITY_GESTURE
+
+	#
+	# Schedule action, returns completion future. Raises ValueError when action, direction or value is not an integer
+	#
+	def schedule(self, action, direction, value, priority=None)->Future:
+		action, direction, value = int(action), int(direction), int(value)
+		if priority is None:
+			priority = self.priority(action)
+		task = BODY_TASK(action, direction, value, priority)
+
+		if priority == PRIORITY_STOP:
+			self.stop()
+			task.resolve("done")
+			return task.future
+
+		with self.cond:
+			if not self.enabled:
+				task.resolve("cancelled")
+				return task.future
+
+			self.counters["scheduled"] += 1
+			if priority == PRIORITY_GESTURE:
+				self.merge(task)
+
+			heapq.heappush(self.pending, (priority, next(self.sequence), task))
+			self.cond.notify()
+
+		return task.future
+
+	#
+	# Replace pending gesture on the same joint, bound pending gestures (cond must be held)
+	#
+	def merge(self, task):
+		gestures = [entry for entry in self.pending if entry[2].priority == PRIORITY_GESTURE]
+		for entry in gestures:
+			if entry[2].action == task.action:
+				self.remove(entry, "merged")
+				self.counters["merged"] += 1
+				gestures.remove(entry)
+				break
+
+		while len(gestures) >= MAX_PENDING_GESTURES:
+			self.remove(gestures.pop(0), "cancelled")
+			self.counters["dropped"] += 1
+
+	def remove(self, entry, result):
+		self.pending.remove(entry)
+		heapq.heapify(self.pending)
+		entry[2].resolve(result)
+
+	#
+	# Scheduler worker
+	#
+	def worker(self):
+		print("Body scheduler started.")
+		while True:
+			with self.cond:
+				task = self.next_task()
+				while task is None:
+					self.cond.wait(self.wait_time())
+					task = self.next_task()
+
+				heapq.heappop(self.pending)
+				preempt = self.preempt
+				self.active = task
+				self.active_until = time.monotonic() + ACTION_TIME
+
+				# Subscribe before sending so the completion notification can not be missed
+				subscription = None
+				if task.action in NOTIFIED_ACTIONS and self.notifications:
+					subscription = self.notifications.subscribe(NOTIFIED_ACTIONS[task.action])
+				self.active_subscription = subscription
+
+			with self.send_lock:
+				# Stopped before it was sent
+				if task.stopped:
+					self.complete(task, "stopped")
+					continue
+
+				if preempt:
+					print("Robot action preempted by : " + task.url())
+					self.send("/bodyaction?action=" + str(ACTION_STOP) + "&direction=0&value=0")
+
+				print("Robot action : " + task.url())
+				sent = self.send(task.url())
+				self.counters["sent"] += 1
+
+			if sent and task.priority == PRIORITY_LOCOMOTION:
+				for listener in self.listeners:
+					listener(task)
+
+			if subscription:
+				self.complete(task, subscription.wait(task.timeout()) if sent else None)
+			elif not sent:
+				self.complete(task, "failed")
+
+	#
+	# Next task to run, None while the running task occupies the body (cond must be held)
+	#
+	def next_task(self)-> any:
+		self.preempt = False
+		# Running gesture ended
+		if self.active is not None and self.active_subscription is None and time.monotonic() >= self.active_until:
+			self.complete(self.active, "done", locked=True)
+
+		if not self.pending:
+			return None
+
+		task = self.pending[0][2]
+		if self.active is not None:
+			# Same or lower priority waits, walk/turn in progress is only interrupted by a stop
+			if task.priority >= self.active.priority or self.active_subscription is not None:
+				return None
+			self.preempt = True
+			self.counters["preempted"] += 1
+			self.complete(self.active, "preempted", locked=True)
+
+		return task
+
+	#
+	# Wait time of worker : until the running gesture ends, or until notified (cond must be held)
+	#
+	def wait_time(self)-> any:
+		if self.active is not None and self.active_subscription is None:
+			return max(self.active_until - time.monotonic(), 0.01)
+		return None
+
+	#
+	# Complete task, releases the body when it is the running task
+	#
+	def complete(self, task, result, locked=False):
+		if not locked:
+			with self.cond:
+				return self.complete(task, result, locked=True)
+
+		if self.active is task:
+			if self.active_subscription:
+				self.active_subscription.close()
+			self.active = None
+			self.active_subscription = None
+			self.cond.notify()
+		task.resolve(result)
+
+	#
+	# Listener called on locomotion (robot moves)
+	#
+	def add_listener(self, listener):
+		self.listeners.append(listener)
+
+	#
+	# Immediate stop : clear pending actions and stop the robot
+	#
+	def stop(self):
+		with self.cond:
+			self.counters["stops"] += 1
+			self.cancel(result="stopped", locked=True)
+			active, subscription = self.active, self.active_subscription
+			if active:
+				active.stopped = True
+
+		print("Robot bodyactions immediate stop.")
+		with self.send_lock:
+			self.send("/bodyaction?action=" + str(ACTION_STOP) + "&direction=0&value=0")
+
+		if subscription:
+			# Release worker waiting on the walk/turn notification, the robot also notifies unless unreachable
+			subscription.put(NOTIFICATION(NOTIFIED_ACTIONS[active.action] + "_stopped"))
+		elif active:
+			self.complete(active, "stopped")
+
+	#
+	# Cancel pending actions of priority (None = all)
+	#
+	def cancel(self, priority=None, result="cancelled", locked=False):
+		if not locked:
+			with self.cond:
+				return self.cancel(priority, result, locked=True)
+
+		for entry in list(self.pending):
+			if priority is None or entry[2].priority == priority:
+				self.remove(entry, result)
+
+	#
+	# Enable/disable scheduling, disabling stops the robot
+	#
+	def set_enabled(self, enabled):
+		with self.cond:
+			self.enabled = enabled
+		if not enabled:
+			self.stop()
+
+	def stats(self)->dict:
+		with self.cond:
+			stats = dict(self.counters)
+			stats["pending"] = len(self.pending)
+			stats["active"] = self.active.url() if self.active else None
+			stats["enabled"] = self.enabled
+		return stats
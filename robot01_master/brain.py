@@ -17,21 +17,20 @@ import queue
 import wave
 
 from stt_distil_whisper import STT
-from robot01 import ROBOT
+from robot01 import ROBOT, TTS_VOICE
+from sensor_sampler import SENSOR_RATE, SENSOR_SAMPLER
+from notifications import NOTIFICATION_BUS, NOTIFICATION
+from state_push import STATE_PUSH
+from chat_pipeline import CHAT_PIPELINE
+from agent_runtime import AGENT_RUNTIME, cancel_requested
+from vision_cache import VISION_CACHE
 
 from typing import List
 import re
 
-from langchain_core.tools import tool
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import ConfigurableField
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.tools.base import StructuredTool
+# Langchain is imported on agent initialization (warm-up), see agentInit
 from pydantic import BaseModel, Field
 
-from langchain_openai import ChatOpenAI
-
 from typing import TypedDict
 
 import ollama
@@ -46,6 +45,16 @@ AGENT_TEMP = 0.1
 # STT Queue size
 STT_Q_SIZE = 3
 
+# Max wait for the agent to be initialized on an agent prompt (seconds)
+AGENT_READY_TIMEOUT = 120
+
+# Max age of the heading used to validate cached vision results (seconds)
+VISION_HEADING_MAX_AGE = 5
+
+# Push intervals of health and sensor state to the web ui (seconds)
+PUSH_HEALTH_INTERVAL = 5
+PUSH_SENSORS_INTERVAL = 1
+
 CONFIG_FILE = "config.json"
 
 # Default configuration
@@ -55,7 +64,10 @@ default_config = {
 	"llm_system":  "",
 	"agent_system": "",
 	"openAI_api_key": "",
-	"weather_api_key": ""
+	"weather_api_key": "",
+	"stt_engine": "whisper_hf",
+	"tts_voice": TTS_VOICE,
+	"sensor_rate": SENSOR_RATE
 }
 
 # Max tokens to TTS
@@ -74,14 +86,17 @@ class BRAIN:
 		# mode is Chat mode / Agent mode
 		self.llm_mode = "chat mode"
 
-		# Last notification received from robot
-		self.last_notification = ""
+		# Notifications received from robot
+		self.notifications = NOTIFICATION_BUS()
 		
 		# Robot01
-		self.robot = ROBOT(self.config["robot01_ip"], self.config["sense_ip"])
+		self.robot = ROBOT(self.config["robot01_ip"], self.config["sense_ip"], int(self.config.get("tts_voice", TTS_VOICE)), float(self.config.get("sensor_rate", SENSOR_RATE)), self.notifications)
 		
 		# stt engine
 		self.stt_q = queue.Queue(maxsize=STT_Q_SIZE)
+		# Latest partial transcription while the user is still speaking
+		self.partial_text = ""
+		self.llm_preparing = False
 		self.stt_engine = STT(self) #uses display for signalling speech detection
 
 		# Original prompt. Used in some tools called by the supervisor
@@ -91,13 +106,58 @@ class BRAIN:
 		self.audiolist = [os.path.basename(filepath) for filepath in glob.glob("audio/*.raw")]
 		
 		# AI / LLM routine helpers
-		self.chat_running = False
-		self.chat_interrupt = False
+		# Chat response pipeline : LLM tokens -> sentences -> TTS audio
+		self.chat = CHAT_PIPELINE(self.robot, TTS_MAX_SENTENCE_LENGHT)
 
-		self.agent_running = False
-		self.agent_interrupt = False
+		# Agent runtime : one event loop for all agent prompts
+		self.agent = AGENT_RUNTIME(self.run_agent)
+		# LLM clients of the agent, reused across agent re-initialization (see agent_llm)
+		self.agent_llms = {}
 		
-		self.agentInit()
+		# Vision results of unchanged scenes, invalidated when the robot walks or turns
+		# Heading from the sampled IMU reading, fetched from the robot when stale
+		self.vision_cache = VISION_CACHE(heading=lambda: self.robot.motionSensor_info(VISION_HEADING_MAX_AGE)['yaw'])
+		self.robot.body.add_listener(self.vision_cache.invalidate)
+
+		# State pushed to web clients, sampled once for all clients
+		self.push = STATE_PUSH()
+		self.push.topic("health", self.health_status, PUSH_HEALTH_INTERVAL)
+		self.push.topic("sensors", self.sensor_status, PUSH_SENSORS_INTERVAL)
+
+		# Readiness of components loading in the background
+		self.ready = {"tts" : threading.Event(), "stt" : threading.Event(), "agent" : threading.Event()}
+		threading.Thread(target=self.warmup, daemon=True).start()
+
+	#
+	# Warm-up : load models and agent in the background, web server and body controls are usable meanwhile
+	#
+	def warmup(self):
+		print("Warm-up started.")
+		try:
+			self.agentInit()
+			self.ready["agent"].set()
+		except Exception as e:
+			print("Warm-up agent error : ", e)
+
+		try:
+			self.robot.tts_engine.load()
+			self.ready["tts"].set()
+		except Exception as e:
+			print("Warm-up TTS error : ", e)
+
+		try:
+			self.stt_engine.loadmodels()
+			self.ready["stt"].set()
+		except Exception as e:
+			print("Warm-up STT error : ", e)
+
+		print("Warm-up ended.")
+
+	#
+	# Readiness of components
+	#
+	def readiness(self)->dict:
+		return { name : event.is_set() for name, event in self.ready.items() }
 		
 	#
 	# Start brain	
@@ -110,29 +170,19 @@ class BRAIN:
 		threading.Thread(target=self.stt_worker, daemon=True).start()
 
 		# Show neutral face after time to settle down
-		time.sleep(5)
-		self.robot.display.state(3) 
+		Timer(5, self.robot.display.state, args=[3]).start()
 
 	#
 	# Stop AI Agent
 	#
 	def stop(self):
-		self.robot.bodyaction(12, 0, 0)
-		
-		# Cancel chat task
-		self.chat_interrupt = True
-		if self.chat_running:
-			while self.chat_running:
-				time.sleep(1)
-			print("Chat task done.")
+		# Cancel chat response and speech first, does not wait for the LLM stream or the body stop round trip
+		self.chat.cancel()
 
-		# Cancel the Agentic task
-		self.agent_interrupt = True
-		if self.agent_running:
-		
-			while self.agent_running:
-				time.sleep(1)
-			print("Agentic task done.")
+		# Cancel the Agentic task(s), interrupted at their next await
+		self.agent.cancel_all()
+
+		self.robot.bodyaction(12, 0, 0)
 		
 		self.robot.display.state(3)
 		
@@ -169,24 +219,66 @@ class BRAIN:
 		status["robot01_latency"] = self.robot.latency
 		status["sense"] = self.robot.sense.health
 		status["sense_latency"] = self.robot.sense.latency
+		status["ready"] = self.readiness()
 		
 		return status
 
-	# Super simple Receive notification from robot hack, does not use queuing
+	#
+	# Report sensor readings
+	#
+	def sensor_status(self):
+		status = {}
+		status["distance"] = self.robot.distanceSensor_info()
+		status["motion"] = self.robot.motionSensor_info()
+
+		return status
+
+	#
+	# Sensor history of the last seconds, downsampled to at most points samples
+	#
+	def sensor_history(self, seconds, points):
+		rows = self.robot.sensors.downsampled(seconds, points)
+		return { "stats" : self.robot.sensors.stats(), "samples" : SENSOR_SAMPLER.to_list(rows) }
+
+	#
+	# Chat pipeline metrics of the last response, agent runtime prompts
+	#
+	def chat_stats(self):
+		stats = self.chat.stats()
+		stats["agent"] = self.agent.stats()
+		return stats
+
+	#
+	# Report http connection pool statistics
+	#
+	def http_stats(self):
+		stats = {}
+		stats["robot01"] = self.robot.http.stats()
+		stats["sense"] = self.robot.sense.http.stats()
+		stats["async_client"] = self.robot.client.stats()
+		stats["display"] = self.robot.display.stats()
+		stats["push"] = self.push.stats()
+		stats["body"] = self.robot.body.stats()
+		stats["vision_cache"] = self.vision_cache.stats()
+
+		return stats
+
+	#
+	# Receive notification from robot, published to all waiting subscribers
+	#
 	def notification(self, notification):
-		self.last_notification = notification;
+		self.notifications.publish(notification)
 		
 	#
 	# Settings handler
 	#
 	def setting(self,item,value)->bool:
-		if item in "robot01_ip robot01sense_ip output micstreaming cam_resolution camstreaming micgain llm_mode bodyactions volume agent_walking":	
+		if item in "robot01_ip robot01sense_ip output micstreaming cam_resolution camstreaming micgain llm_mode bodyactions volume agent_walking tts_voice":	
 
 			if item == "robot01_ip":
 				if	self.validate_ip_address(value):
-					# update running ip
-					self.robot.ip = value
-					self.robot.display.ip = value
+					# update running ip, drops connections to the old device
+					self.robot.set_ip(value)
 					# update config ip					
 					self.config["robot01_ip"] = value
 					self.save_config()
@@ -196,8 +288,8 @@ class BRAIN:
 
 			if item == "robot01sense_ip":
 				if self.validate_ip_address(value):
-					# update running ip
-					self.robot.sense.ip = value
+					# update running ip, drops connections to the old device
+					self.robot.sense.set_ip(value)
 					# update config ip					
 					self.config["sense_ip"] = value
 					self.save_config()
@@ -207,6 +299,11 @@ class BRAIN:
 			if item == "volume":
 				self.robot.volume(value)
 
+			if item == "tts_voice":
+				self.robot.tts_engine.set_voice(int(value))
+				self.config["tts_voice"] = self.robot.tts_engine.voice
+				self.save_config()
+
 			if item == "output":
 				on = True if value == "1" else False
 				self.robot.output(on)
@@ -255,7 +352,7 @@ class BRAIN:
 	# Settings info handler
 	#
 	def get_setting(self,item)->str:
-		if item in "robot01_ip robot01sense_ip output cam_resolution micstreaming camstreaming micgain llm_mode bodyactions volume agent_walking":	
+		if item in "robot01_ip robot01sense_ip output cam_resolution micstreaming camstreaming micgain llm_mode bodyactions volume agent_walking tts_voice":	
 			if item == "robot01_ip":
 				return self.robot.ip
 	
@@ -273,6 +370,9 @@ class BRAIN:
 
 			if item == "volume":
 				return self.robot.volume()
+
+			if item == "tts_voice":
+				return self.robot.tts_engine.voice
 				
 			if item == "micgain":
 				return self.robot.sense.micgain()
@@ -323,6 +423,9 @@ class BRAIN:
 			message = ""
 
 			for message in words_and_delimiters:
+				# Agent prompt stopped
+				if cancel_requested():
+					break
 				if not message.strip() == "" and len(message) > 1:
 					print("From LLM (Speak chunked response): " + message)
 					# Put text in output queue
@@ -338,10 +441,33 @@ class BRAIN:
 		print("stt queue worker started")
 		while True:
 			text = self.stt_q.get()[0]
+			self.partial_text = ""
 			print("From STT: " + text)
 			self.prompt(text)
 			self.stt_q.task_done()
 
+	#
+	# Partial transcription from STT while the user is still speaking
+	# Starts preparing the LLM so the final prompt does not wait for model loading
+	#
+	def partial_transcription(self, transcription):
+		self.partial_text = transcription[0] if transcription else ""
+
+		if self.llm_mode == "chat mode" and not self.llm_preparing:
+			self.llm_preparing = True
+			threading.Thread(target=self.prepare_llm, daemon=True).start()
+
+	#
+	# Load chat LLM in Ollama (empty messages only loads the model)
+	#
+	def prepare_llm(self):
+		try:
+			ollama.chat(model = LLM_MODEL, keep_alive = OLLAMA_KEEP_ALIVE, messages = [])
+		except Exception as e:
+			print("Prepare LLM error : ", e)
+
+		self.llm_preparing = False
+
 	#
 	# Validate IP Addresses
 	#
@@ -357,11 +483,17 @@ class BRAIN:
 	
 	#
 	# Prompt input for chat and Agent AI
+	# Chat returns when the response is queued for speech. Agent prompts are submitted without waiting,
+	# they run in submission order (see AGENT_RUNTIME), returns the handle (None when the agent is not ready)
 	#
-	def prompt(self,text)->str:
+	def prompt(self,text)-> any:
 		
-		# Cancel previous actions
-		self.stop();
+		# Chat : cancel previous actions
+		if self.llm_mode == "chat mode":
+			self.stop();
+		# Agentic AI : only interrupt speech, running and queued agent prompts are kept and the new one queues behind them
+		else:
+			self.chat.cancel()
 	
 		self.robot.display.state(18)
 
@@ -371,18 +503,29 @@ class BRAIN:
 			
 		# Agentic AI
 		if self.llm_mode == "agent mode":
-			asyncio.run(self.run_agent(text))
+			return self.submit_agent(text)
+
+	#
+	# Submit prompt to the agent runtime, returns handle (None when the agent is not ready)
+	#
+	def submit_agent(self, text):
+		if not self.ready["agent"].wait(AGENT_READY_TIMEOUT):
+			print("Agent not ready.")
+			return None
+		return self.agent.submit(text)
 
 	# 
-	# chat_interaction : Streaming chat based response 
+	# chat_interaction : Streaming chat based response through the chat pipeline
 	# Args:
 	# prompt (str) : prompt 
 	#
 	def chat_interaction(self,prompt: str):
-		
-		self.chat_running = True
-		self.chat_interrupt = False
-				
+		self.chat.process(self.llm_tokens(prompt))
+
+	#
+	# LLM token stream, the request is made on first iteration (by the pipeline token stage)
+	#
+	def llm_tokens(self, prompt: str):
 		stream = ollama.chat(
 			model = LLM_MODEL,
 			keep_alive = OLLAMA_KEEP_ALIVE,
@@ -390,59 +533,40 @@ class BRAIN:
 			stream=True,
 		)
 		
-		# iterate over streaming parts and construct sentences to send to tts
-		message = ""
-		n = 0
 		for chunk in stream:
-			token = chunk['message']['content']
-			
-			# print(token)
-			if token in ".,?!...;:])" or n > TTS_MAX_SENTENCE_LENGHT:
-				message = message + token
-				if not message.strip() == "" and len(message) > 1:
-					print("From LLM (chat): " + message)
-
-					try:
-						self.robot.tts_engine.text_q.put(message)
-					except Exception as e:
-						print("Chat: TTS text_q queue error : ", type(e).__name__ )
-						
-				message = ""
-				n = 0
-			else:
-				message = message + token
-				n = n + 1
-				
-			if self.chat_interrupt:  
-				break
-		
-		self.chat_running = False
-		return
+			yield chunk['message']['content']
 
 	# 
-	# run_agent : Agentic AI. Run with async.run
+	# run_agent : Agentic AI. Runs on the agent runtime loop, cancelled by stop
 	# Args:
 	# prompt (str) : prompt 
 	#
 	async def run_agent(self,prompt: str):
 
-		self.agent_running = True
-		self.agent_interrupt = False
-
 		async for event in self.supervisor_agent_executor.astream_events({"input": prompt}, version="v1" ):
-			if self.agent_interrupt:
-				print("Agent interrupted!!!")
-				break;
 			#print(event)
+			pass
 
 		print("Agentic Action(s) ended.")
-		self.agent_running = False
+
+	#
+	# LLM client of the agent, created once per settings (key) so its http connection pool is reused
+	#
+	def agent_llm(self, key, create):
+		if key not in self.agent_llms:
+			self.agent_llms[key] = create()
+		return self.agent_llms[key]
 
 	#
 	# Agent initialization of (global)executor:
 	# self.supervisor_agent_executor
 	#
 	def agentInit(self):
+		from langchain_ollama import ChatOllama
+		from langchain_openai import ChatOpenAI
+		from langchain_core.prompts import ChatPromptTemplate
+		from langchain.agents import create_tool_calling_agent, AgentExecutor
+		from langchain.tools.base import StructuredTool
 	
 		# Langchain prompt
 		supervisor_prompt_template = ChatPromptTemplate.from_messages([
@@ -458,88 +582,98 @@ class BRAIN:
 		# Input schema for string
 		class toolStrInput(BaseModel):
 			param1: str
+		# Input schema for list of strings
+		class toolStrListInput(BaseModel):
+			param1: List[str]
 
-		toolSpeak = StructuredTool.from_function(func=self.speak, name="Speak",  description="""
+		toolSpeak = StructuredTool.from_function(func=self.speak, coroutine=self.threaded_tool(self.speak), name="Speak",  description="""
 		Use this tool to output your result. Convert any digits in the result to fully spelled out words.
 		As Robot Sappie you are able to use this tool enables the TTS engine allowing Sappie to speak. 
 		For example: Use this whenever required to communicate. You can also use this tool for intermediate outputs or singing.
 		The function takes your response as input. 
 		""", args_schema=toolStrInput)
 
-		toolCurrentHeading = StructuredTool.from_function(func=self.current_heading, name="currentHeading", description="""
+		toolCurrentHeading = StructuredTool.from_function(func=self.current_heading, coroutine=self.threaded_tool(self.current_heading), name="currentHeading", description="""
 		Use this tool can to get the current heading robot Sappie is looking towards.
 		When walking forward this is the heading/direction of robot Sappie.
 		The heading is in degrees from 180 to -180. Heading 0 is North. Negative is left/west/counter clockwise. Positive is right/east/clockwise. """)
 		
-		toolDescribeView = StructuredTool.from_function(func=self.describe_view, name="DescribeView", description="""
+		toolDescribeView = StructuredTool.from_function(func=self.describe_view, coroutine=self.threaded_tool(self.describe_view), name="DescribeView", description="""
 		Use this tool to see or look what is in front of robot Sappie.
 		It returns a description of the environment and a list of what robot Sappie can currently see.
 		The tool takes as input any specific details about what to see.
 		Use the exact description of this tool, do no add or change anything to the response.""", args_schema=toolStrInput)
 		
-		toolFindInView = StructuredTool.from_function(func=self.find_in_view, name="FindInView",  description="""
+		toolFindInView = StructuredTool.from_function(func=self.find_in_view, coroutine=self.threaded_tool(self.find_in_view), name="FindInView",  description="""
 		Use this tool to discover the given subject in front of you as Robot Sappie.
 		This tool provides the ability to detect someone, something or an activity.
 		The tool will return a positive or negative response based on the question.
 		The tool takes as input a description of what to identify, the subject.
 		""", args_schema=toolStrInput)
 
-		toolcurrentDateAndTime = StructuredTool.from_function(func=self.current_time_and_date, name="currentDateAndTime",  description="""
+		toolFindManyInView = StructuredTool.from_function(func=self.find_many_in_view, coroutine=self.threaded_tool(self.find_many_in_view), name="FindManyInView",  description="""
+		Use this tool to discover several subjects in front of you as Robot Sappie at once.
+		Use this tool instead of calling FindInView several times.
+		The tool will return a positive or negative response for each subject.
+		The tool takes as input a list of descriptions of what to identify, the subjects.
+		""", args_schema=toolStrListInput)
+
+		toolcurrentDateAndTime = StructuredTool.from_function(func=self.current_time_and_date, coroutine=self.threaded_tool(self.current_time_and_date), name="currentDateAndTime",  description="""
 		Use this tool to get both the current date and the current time.
 		""")
 
-		toolWeatherForecast = StructuredTool.from_function(func=self.weather_forecast, name="weatherForecast",  description="""
+		toolWeatherForecast = StructuredTool.from_function(func=self.weather_forecast, coroutine=self.threaded_tool(self.weather_forecast), name="weatherForecast",  description="""
 		Us this tool to get the current weather and the weather forecast.
 		It will provide the current weather, the weather forecast of tomorrow, and the weather forecast for the day after tomorrow. 
 		No other weather information besides these days is available. """)
 		
-		toolWalkForward = StructuredTool.from_function(func=self.walk_forward, name="WalkForward", description=
+		toolWalkForward = StructuredTool.from_function(func=self.walk_forward, coroutine=self.walk_forward_async, name="WalkForward", description=
 		"""
 		Use this tool to let the robot walk forward.
 		The function takes as input a number (integer) with the amount of steps to walk forward with a maximum of 100 steps.
 		""",args_schema=toolIntInput)
 
-		toolWalkBackward = StructuredTool.from_function(func=self.walk_backward, name="WalkBackward", description=
+		toolWalkBackward = StructuredTool.from_function(func=self.walk_backward, coroutine=self.walk_backward_async, name="WalkBackward", description=
 		"""
 		Use this tool to let the robot walk backwards.
 		The function takes as input a number (integer) with the amount of steps to walk backwards with a maximum of 50 steps.
 		""",args_schema=toolIntInput)
 
-		toolTurn = StructuredTool.from_function(func=self.turn, name="Turn", description=
+		toolTurn = StructuredTool.from_function(func=self.turn, coroutine=self.turn_async, name="Turn", description=
 		"""
 		Use this tool to turn the robot in degrees.
 		A negative number of degrees is left/counter clockwise and a positive number of degrees right/clockwise.
 		The function takes as input the degrees as a number (integer).
 		""",args_schema=toolIntInput)
 
-		toolShake = StructuredTool.from_function(func=self.shake, name="shake", description=
+		toolShake = StructuredTool.from_function(func=self.shake, coroutine=self.shake_async, name="shake", description=
 		"""
 		Use this tool to shake the robots body.
 		The function takes as input a number (integer) with the amount of shakes to do with a maximum of 10 steps.
 		""",args_schema=toolIntInput)
 
-		toolMoveRightLowerArm = StructuredTool.from_function(func=self.move_right_lower_arm, name="MoveRightLowerArm", description=
+		toolMoveRightLowerArm = StructuredTool.from_function(func=self.move_right_lower_arm, coroutine=self.threaded_tool(self.move_right_lower_arm), name="MoveRightLowerArm", description=
 		"""
 		Use this tool to move the robots lower right arm up or down.
 		Use direction 1 to move the arm up, Use direction 0 to move the arm down.
 		The function takes as input a number (integer) for the direction.
 		""",args_schema=toolIntInput)
 
-		toolMoveLeftLowerArm = StructuredTool.from_function(func=self.move_left_lower_arm, name="MoveRightLowerArm", description=
+		toolMoveLeftLowerArm = StructuredTool.from_function(func=self.move_left_lower_arm, coroutine=self.threaded_tool(self.move_left_lower_arm), name="MoveRightLowerArm", description=
 		"""
 		Use this tool to move the robots lower left arm up or down.
 		Use direction 1 to move the arm up, Use direction 0 to move the arm down.
 		The function takes as input a number (integer) for the direction.
 		""",args_schema=toolIntInput)
 
-		toolMoveRightUpperArm = StructuredTool.from_function(func=self.move_right_upper_arm, name="MoveRightUpperArm", description=
+		toolMoveRightUpperArm = StructuredTool.from_function(func=self.move_right_upper_arm, coroutine=self.threaded_tool(self.move_right_upper_arm), name="MoveRightUpperArm", description=
 		"""
 		Use this tool to move the robots upper right arm up or down.
 		Use direction 1 to move the arm up, Use direction 0 to move the arm down.
 		The function takes as input a number (integer) for the direction.
 		""",args_schema=toolIntInput)
 		
-		toolMoveLeftUpperArm = StructuredTool.from_function(func=self.move_left_upper_arm, name="MoveLeftUpperArm", description=
+		toolMoveLeftUpperArm = StructuredTool.from_function(func=self.move_left_upper_arm, coroutine=self.threaded_tool(self.move_left_upper_arm), name="MoveLeftUpperArm", description=
 		"""
 		Use this tool to move the robots upper left arm up or down.
 		Use direction 1 to move the arm up, Use direction 0 to move the arm down.
@@ -547,27 +681,27 @@ class BRAIN:
 		""",args_schema=toolIntInput)
 		
 		llm_tools = [
-			toolSpeak, toolCurrentHeading, toolDescribeView, toolFindInView, toolcurrentDateAndTime, toolWeatherForecast,
+			toolSpeak, toolCurrentHeading, toolDescribeView, toolFindInView, toolFindManyInView, toolcurrentDateAndTime, toolWeatherForecast,
 			toolWalkForward,toolWalkBackward,toolTurn,toolShake,toolMoveRightLowerArm,toolMoveLeftLowerArm,
 			toolMoveRightUpperArm, toolMoveLeftUpperArm
 			
 		]
 		
 		# Langchain llm
-		supervisor_llm = ChatOllama(
+		supervisor_llm = self.agent_llm(("ollama", AGENT_MODEL), lambda: ChatOllama(
 			model=AGENT_MODEL,
 			temperature=AGENT_TEMP,
 			keep_alive = OLLAMA_KEEP_ALIVE,
-		)
+		))
 		
-		openAI_LLM = ChatOpenAI(
+		openAI_LLM = self.agent_llm(("openai", self.config["openAI_api_key"]), lambda: ChatOpenAI(
 			model="gpt-4o-2024-08-06",
 			temperature=AGENT_TEMP,
 			max_tokens=None,
 			timeout=None,
 			max_retries=2,
 			api_key=self.config["openAI_api_key"]
-			)
+			))
 		
 		# Langchain agent executor init
 		supervisor_agent = create_tool_calling_agent(openAI_LLM, llm_tools, supervisor_prompt_template)
@@ -592,27 +726,20 @@ class BRAIN:
 	def describe_view(self, param1: str)->str :		
 		self.robot.display.state(13)
 		print("Tool : describe_view.")
-		image = self.robot.sense.capture()
+		image = self.robot.sense.capture_jpeg()
 		self.robot.display.state(20)
 
-		if image=="" : 
+		if not image : 
 			description = "Robot Sappie sees nothing."
 			print("No image")
 		else:
-			description = ollama.generate(
-				model = VISION_MODEL,
-				keep_alive = OLLAMA_KEEP_ALIVE,
-				prompt = """
+			description = self.vision_query(image, """
 				Describe what you see in the image, and only what is in the image.
 				Limit any interpretation in your respond, be concise. 
 				Do not describe any person/human as old or worn, describe them in a flattering and positive way. 
-				""" +  param1,
-				images = [image]			 
-			)
-			if description['response'] == "":
+				""" +  param1)
+			if description == "":
 				description = "Robot Sappie sees nothing."
-			else:
-				description = description['response']
 		
 		print(description)
 		return description
@@ -623,28 +750,111 @@ class BRAIN:
 	def find_in_view(self, param1: str)->str:
 		self.robot.display.state(13)
 		print("Tool : find_in_view.")
-		image = self.robot.sense.capture()
+		image = self.robot.sense.capture_jpeg()
 		self.robot.display.state(20)
 
-		if image=="" : 
+		if not image : 
 			description = "Robot Sappie sees nothing."
 			print("No image")
 		else:
-			description = ollama.generate(
-				model = VISION_MODEL,
-				keep_alive = -1,
-				prompt = "Do you see a " + param1 + " in the image. Give a short answer.",
-				images = [image]			 
-			)
-
-			if description['response'] == "":
+			description = self.vision_query(image, "Do you see a " + param1 + " in the image. Give a short answer.")
+
+			if description == "":
 				description = "Robot Sappe sees nothing."
-			else:
-				description = description['response']
 		
 		print("VISION MODEL : " + description)		
 		return description
 		
+	#
+	# Vision model response on image (JPEG bytes), cached for unchanged scenes
+	# encoded : base64 of the image when already encoded, else the ollama client encodes it
+	#
+	def vision_query(self, jpeg, prompt, encoded=None)->str:
+		response = self.vision_cache.get(jpeg, prompt)
+		if response is not None:
+			print("Vision cache hit.")
+			return response
+
+		response = ollama.generate(
+			model = VISION_MODEL,
+			keep_alive = OLLAMA_KEEP_ALIVE,
+			prompt = prompt,
+			images = [encoded if encoded else jpeg]
+		)['response']
+
+		if response != "":
+			self.vision_cache.put(jpeg, prompt, response)
+		return response
+
+	#
+	# Answers to several questions on one image (JPEG bytes), the image is base64 encoded once for all calls
+	# Cached answers are reused, the remaining questions are asked in one numbered multi-part call.
+	# When the answers can not be matched to the questions, they are asked one by one on the same encoded image.
+	#
+	def vision_questions(self, jpeg, questions)->list:
+		encoded = None
+		answers = [self.vision_cache.get(jpeg, question) for question in questions]
+		open_questions = [question for question, answer in zip(questions, answers) if answer is None]
+
+		new_answers = []
+		if open_questions:
+			encoded = base64.b64encode(jpeg).decode("ascii")
+
+		if len(open_questions) == 1:
+			new_answers = [self.vision_query(jpeg, open_questions[0], encoded)]
+		elif open_questions:
+			prompt = "Answer each of the following questions about the image with a short answer. "
+			prompt = prompt + "Answer on one line per question, starting with the number of the question.\n"
+			prompt = prompt + "\n".join(str(n + 1) + ". " + question for n, question in enumerate(open_questions))
+
+			response = ollama.generate(model = VISION_MODEL, keep_alive = OLLAMA_KEEP_ALIVE, prompt = prompt, images = [encoded])['response']
+			new_answers = self.numbered_answers(response, len(open_questions))
+
+			if new_answers is None:
+				print("Vision multi-part answer not matched, asking questions one by one.")
+				new_answers = [self.vision_query(jpeg, question, encoded) for question in open_questions]
+			else:
+				for question, answer in zip(open_questions, new_answers):
+					if answer != "":
+						self.vision_cache.put(jpeg, question, answer)
+		
+		new_answers = iter(new_answers)
+		return [answer if answer is not None else next(new_answers) for answer in answers]
+
+	#
+	# Numbered answers (1. ... 2. ...) of a multi-part response, None when not all answers are found
+	#
+	def numbered_answers(self, response, count)-> any:
+		answers = {}
+		for line in response.splitlines():
+			match = re.match(r"\s*\**\s*(\d+)\s*[.):]\**\s*(.*)", line)
+			if match and 1 <= int(match.group(1)) <= count:
+				answers[int(match.group(1))] = match.group(2).strip()
+
+		if len(answers) != count:
+			return None
+		return [answers[n + 1] for n in range(count)]
+
+	#
+	# find_many_in_view tool : one capture for several subjects
+	#
+	def find_many_in_view(self, param1: List[str])->str:
+		self.robot.display.state(13)
+		print("Tool : find_many_in_view.")
+		image = self.robot.sense.capture_jpeg()
+		self.robot.display.state(20)
+
+		if not image : 
+			print("No image")
+			return "Robot Sappie sees nothing."
+
+		questions = ["Do you see a " + subject + " in the image. Give a short answer." for subject in param1]
+		answers = self.vision_questions(image, questions)
+
+		description = "\n".join(subject + " : " + (answer if answer != "" else "not seen") for subject, answer in zip(param1, answers))
+		print("VISION MODEL : " + description)
+		return description
+
 	#
 	# Current date and time tool
 	#
@@ -694,30 +904,31 @@ class BRAIN:
 	#
 	def walk_forward(self, param1: int)->str:
 		print("Tool : walk forward " + str(param1))
-		self.robot.bodyaction(14,0,param1)
-		result = ""
 		
 		if self.robot.agent_walking:
-			while not "walking" in result:
-				time.sleep(1)
-				result = self.last_notification
-	
-			if "walking_stopped" in result:
-				result = "Stopped by request."
-	
-			if "walking_blocked" in result:
-				self.robot.bodyaction(15,0,10)
-				result = "Walking was blocked, took 10 steps backwards to clear path, turning needed."
-				
-			if "walking_ended" in result:
-				result = "Succesfully walked " + str(param1) + " steps."
-
+			# Completes on the walking notification of the robot
+			notification = self.robot.bodyaction(14,0,param1).result()
+			result = self.walk_forward_result(param1, notification)
 		else:
 			result = "You do not want to walk forward."
 			
-		self.last_notification = ""
 		return result + ". " + self.current_heading()
 
+	#
+	# Walk forward result of walking notification
+	#
+	def walk_forward_result(self, param1, notification)->str:
+		if notification in ("stopped", "cancelled"):
+			return "Stopped by request."
+		if not isinstance(notification, NOTIFICATION):
+			return "No response from the robot while walking"
+		if notification.status == "stopped":
+			return "Stopped by request."
+		if notification.status == "blocked":
+			self.robot.bodyaction(15,0,10)
+			return "Walking was blocked, took 10 steps backwards to clear path, turning needed."
+		return "Succesfully walked " + str(param1) + " steps."
+
 	#
 	# Walk backwards tool
 	#
@@ -739,38 +950,44 @@ class BRAIN:
 	#
 	def turn(self, param1: int)->str:
 
-		motionsensor = self.robot.motionSensor_info()
-		heading = int(motionsensor['yaw'])
-		turn = heading + param1
-		print("Tool : Turn " + str(turn))
+		turn = self.turn_target(param1)
 
 		if self.robot.agent_walking:
-			self.robot.bodyaction(10,0,turn)
-	
-			result = ""
-			while not "turn" in result:
-				time.sleep(1)
-				result = self.last_notification
-				
-			if "turn_stopped" in result:
-				result = "Stopped by request."
-	
-			if "turn_error" in result:
-				result = "Error while turning."
-	
-			if "turn_blocked" in result:
-				self.robot.bodyaction(15,0,10)
-				result = "Turning was blocked, took 10 steps back to clear."
-	
-			if "walking_ended" in result:
-				result = "Succesfully turned."
-
+			# Completes on the turn notification of the robot
+			notification = self.robot.bodyaction(10,0,turn).result()
+			result = self.turn_result(notification)
 		else:
 			result = "You did not want to turn."
 
-		self.last_notification = ""
 		return result + "." + self.current_heading()
 
+	#
+	# Turn target heading
+	#
+	def turn_target(self, param1)->int:
+		motionsensor = self.robot.motionSensor_info()
+		heading = int(motionsensor['yaw'])
+		turn = heading + param1
+		print("Tool : Turn " + str(turn))
+		return turn
+
+	#
+	# Turn result of turn notification
+	#
+	def turn_result(self, notification)->str:
+		if notification in ("stopped", "cancelled"):
+			return "Stopped by request."
+		if not isinstance(notification, NOTIFICATION):
+			return "No response from the robot while turning"
+		if notification.status == "stopped":
+			return "Stopped by request."
+		if notification.status in ("error", "sensor_error"):
+			return "Error while turning."
+		if notification.status == "blocked":
+			self.robot.bodyaction(15,0,10)
+			return "Turning was blocked, took 10 steps back to clear."
+		return "Succesfully turned."
+
 	#
 	# Shake tool
 	#
@@ -815,5 +1032,76 @@ class BRAIN:
 		return "You moved left upper arm."
 
 ############################## End of Agentic Tools ##############################
+
+############################## Async Agentic Tools ##############################
+# Coroutine versions of the tools, used by the agent (astream_events) so independent tool calls run concurrently.
+# Waits are awaited (body action futures, asyncio.sleep), blocking device I/O and inference run in a thread.
+
+	#
+	# Run blocking tool in a thread. A thread can not be interrupted, a cancelled prompt skips tools not yet
+	# started and long tools (speak) check cancel_requested() between steps.
+	#
+	def threaded_tool(self, func):
+		def run(*args, **kwargs):
+			if cancel_requested():
+				return "Cancelled."
+			return func(*args, **kwargs)
+
+		async def coroutine(*args, **kwargs):
+			return await asyncio.to_thread(run, *args, **kwargs)
+		return coroutine
+
+	#
+	# Walk forward tool (async)
+	#
+	async def walk_forward_async(self, param1: int)->str:
+		print("Tool : walk forward " + str(param1))
+
+		if self.robot.agent_walking:
+			notification = await asyncio.wrap_future(self.robot.bodyaction(14,0,param1))
+			result = self.walk_forward_result(param1, notification)
+		else:
+			result = "You do not want to walk forward."
+
+		return result + ". " + await asyncio.to_thread(self.current_heading)
+
+	#
+	# Walk backwards tool (async)
+	#
+	async def walk_backward_async(self, param1: int)->str:
+		if not self.robot.agent_walking:
+			return "You do not want to walk backward."
+
+		print("Tool : walk backwards " + str(param1))
+		self.robot.bodyaction(15,0,param1)
+		await asyncio.sleep(param1) # Duration of steps
+		return "You have walked backward."
+
+	#
+	# Turn tool (async)
+	#
+	async def turn_async(self, param1: int)->str:
+		turn = await asyncio.to_thread(self.turn_target, param1)
+
+		if self.robot.agent_walking:
+			notification = await asyncio.wrap_future(self.robot.bodyaction(10,0,turn))
+			result = self.turn_result(notification)
+		else:
+			result = "You did not want to turn."
+
+		return result + "." + await asyncio.to_thread(self.current_heading)
+
+	#
+	# Shake tool (async)
+	#
+	async def shake_async(self, param1: int)->str:
+		print("Tool : Shake " + str(param1))
+
+		self.robot.bodyaction(11,0, param1)
+		await asyncio.sleep(param1)
+
+		return "You have been shaking."
+
+############################## End of Async Agentic Tools ##############################
 			
 		
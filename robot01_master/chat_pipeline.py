@@ -0,0 +1,197 @@
+import time
+import queue
+import threading
+
+# Token buffer between LLM stream and sentence stage, large enough that TTS falling behind does not stall the LLM
+TOKEN_Q_SIZE = 512
+# Max tokens in a sentence sent to TTS
+MAX_SENTENCE_LENGTH = 30
+# Sentence delimiters
+SENTENCE_DELIMITERS = ".,?!...;:])"
+# Wait slice on full/empty buffers, bounds cancellation latency (seconds)
+CANCEL_POLL = 0.02
+
+# End of token stream marker
+END_OF_STREAM = None
+
+# Class CHAT_RUN : state and metrics of one chat response
+class CHAT_RUN:
+	def __init__(self):
+		self.cancelled = threading.Event()
+		self.token_q = queue.Queue(maxsize=TOKEN_Q_SIZE)
+
+		self.start = time.monotonic()
+		self.first_token = None
+		self.first_sentence = None
+		self.llm_end = None
+		self.end = None
+		self.tokens = 0
+		self.sentences = 0
+		# Time blocked on full buffers (backpressure) per stage
+		self.token_wait = 0
+		self.sentence_wait = 0
+		self.error = ""
+
+	#
+	# Put in bounded queue, waits for room in slices to see cancellation. Returns time waited, None when cancelled
+	#
+	def put(self, q, item)-> any:
+		start = time.monotonic()
+		while not self.cancelled.is_set():
+			try:
+				q.put(item, timeout=CANCEL_POLL)
+				return time.monotonic() - start
+			except queue.Full:
+				pass
+		return None
+
+	#
+	# Metrics (seconds since start)
+	#
+	def metrics(self, first_audio=None)->dict:
+		since = lambda t: None if t is None else round(t - self.start, 3)
+		return {
+			"first_token" : since(self.first_token),
+			"first_sentence" : since(self.first_sentence),
+			"first_audio" : since(first_audio) if first_audio and first_audio >= self.start else None,
+			"llm_end" : since(self.llm_end),
+			"end" : since(self.end),
+			"tokens" : self.tokens,
+			"sentences" : self.sentences,
+			"tokens_per_second" : round(self.tokens / (self.llm_end - self.first_token), 1) if self.llm_end and self.first_token and self.llm_end > self.first_token else None,
+			"token_wait" : round(self.token_wait, 3),
+			"sentence_wait" : round(self.sentence_wait, 3),
+			"cancelled" : self.cancelled.is_set(),
+			"error" : self.error,
+		}
+
+# Class CHAT_PIPELINE : token -> sentence -> audio pipeline of chat responses
+#	token stage : thread reading the LLM token stream into a bounded token buffer
+#	sentence stage : builds sentences from tokens and puts them into the TTS text queue (bounded)
+#	audio stage : TTS engine and robot output worker
+# The output is held open while the response is generated, so a slow LLM does not reset the face between sentences.
+# cancel() stops all stages without waiting for the LLM stream.
+class CHAT_PIPELINE:
+	def __init__(self, robot, max_sentence_length=MAX_SENTENCE_LENGTH):
+		self.robot = robot
+		self.max_sentence_length = max_sentence_length
+
+		self.run = None
+		self.last = None
+		self.runs = 0
+		self.cancelled = 0
+
+	#
+	# Running response
+	#
+	def running(self)->bool:
+		return self.run is not None and self.run.end is None
+
+	#
+	# Run pipeline on token iterator (created lazily by the token stage), returns when all sentences are queued for TTS
+	#
+	def process(self, tokens):
+		run = CHAT_RUN()
+		self.run = run
+		self.runs += 1
+		self.robot.hold_output(True)
+
+		threading.Thread(target=self.token_stage, args=[run, tokens], daemon=True).start()
+		try:
+			self.sentence_stage(run)
+		finally:
+			run.end = time.monotonic()
+			self.last = run
+			if run is self.run:
+				self.robot.hold_output(False)
+
+	#
+	# Token stage : LLM stream -> token buffer
+	#
+	def token_stage(self, run, tokens):
+		try:
+			for token in tokens:
+				if run.first_token is None:
+					run.first_token = time.monotonic()
+				run.tokens += 1
+
+				waited = run.put(run.token_q, token)
+				if waited is None:
+					break
+				run.token_wait += waited
+		except Exception as e:
+			run.error = str(e)
+			print("Chat pipeline LLM error : ", e)
+		finally:
+			run.llm_end = time.monotonic()
+			run.put(run.token_q, END_OF_STREAM)
+
+			if hasattr(tokens, "close"):
+				tokens.close()
+
+	#
+	# Sentence stage : token buffer -> TTS text queue
+	#
+	def sentence_stage(self, run):
+		message = ""
+		n = 0
+		while not run.cancelled.is_set():
+			try:
+				token = run.token_q.get(timeout=CANCEL_POLL)
+			except queue.Empty:
+				continue
+
+			if token is END_OF_STREAM:
+				self.sentence(run, message)
+				break
+
+			message = message + token
+			if token in SENTENCE_DELIMITERS or n > self.max_sentence_length:
+				self.sentence(run, message)
+				message = ""
+				n = 0
+			else:
+				n = n + 1
+
+	#
+	# Queue sentence for TTS
+	#
+	def sentence(self, run, message):
+		if message.strip() == "" or len(message) <= 1:
+			return
+
+		print("From LLM (chat): " + message)
+		waited = run.put(self.robot.tts_engine.text_q, message)
+		if waited is None:
+			return
+
+		run.sentence_wait += waited
+		run.sentences += 1
+		if run.first_sentence is None:
+			run.first_sentence = time.monotonic()
+
+	#
+	# Cancel running response : LLM stream, pending sentences, synthesis and audio
+	#
+	def cancel(self):
+		run = self.run
+		if run is None or run.cancelled.is_set():
+			return
+
+		if run.end is None:
+			self.cancelled += 1
+		run.cancelled.set()
+		self.robot.cancel_output()
+		self.robot.hold_output(False)
+
+	#
+	# Metrics of last/running response
+	#
+	def stats(self)->dict:
+		run = self.run if self.running() else self.last
+		return {
+			"running" : self.running(),
+			"runs" : self.runs,
+			"cancelled" : self.cancelled,
+			"last" : run.metrics(self.robot.output_started_time) if run else None,
+		}
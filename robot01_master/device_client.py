@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import aiohttp
+
+# Max concurrent connections per device
+LIMIT_PER_HOST = 4
+# Keep-alive of idle connections (seconds)
+KEEPALIVE_TIMEOUT = 30
+# Default timeout for http calls (seconds)
+DEFAULT_TIMEOUT = 2
+
+debug = False
+
+# Class DEVICE_CLIENT : asyncio http client for the ESP32 devices (robot01 and sense)
+# Runs one event loop in a single thread, calls are made as coroutines on that loop.
+# It only carries the non-blocking calls : fire-and-forget sends and concurrent fetches (sensor sampler).
+# Blocking calls, whose callers need the response, go through the device HTTP_POOL. Callers pass the
+# endpoint timeout of that pool, so both stacks use the same timeouts.
+#	submit()	: fire-and-forget, returns a concurrent.futures.Future
+#
+class DEVICE_CLIENT:
+	def __init__(self, timeout=DEFAULT_TIMEOUT, limit_per_host=LIMIT_PER_HOST):
+		self.timeout = timeout
+		self.limit_per_host = limit_per_host
+		self.session = None
+
+		# Request counters
+		self.requests = 0
+		self.errors = 0
+		self.pending = 0
+
+		self.loop = asyncio.new_event_loop()
+		threading.Thread(target=self.run_loop, daemon=True).start()
+
+	#
+	# Event loop thread
+	#
+	def run_loop(self):
+		asyncio.set_event_loop(self.loop)
+		print("Device client event loop started.")
+		self.loop.run_forever()
+		print("Device client event loop stopped.")
+
+	#
+	# Session is created lazily inside the loop
+	#
+	def get_session(self)-> aiohttp.ClientSession:
+		if self.session is None or self.session.closed:
+			connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, keepalive_timeout=KEEPALIVE_TIMEOUT)
+			self.session = aiohttp.ClientSession(connector=connector)
+
+		return self.session
+
+	#
+	# Coroutine : GET request, returns response body (bytes) or None on error
+	#
+	async def get(self, url, timeout=None)-> bytes:
+		if timeout is None:
+			timeout = self.timeout
+
+		self.requests += 1
+		self.pending += 1
+		try:
+			async with self.get_session().get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+				return await response.read()
+		except Exception as e:
+			self.errors += 1
+			if debug:
+				print("Device client request - " + url + " , error : ", e)
+			else:
+				print("Device client request error")
+		finally:
+			self.pending -= 1
+
+		return None
+
+	#
+	# Coroutine : Concurrent GET requests, results in order of urls
+	#
+	async def get_many(self, urls, timeout=None)-> list:
+		return await asyncio.gather(*[self.get(url, timeout) for url in urls])
+
+	#
+	# Sync wrapper : schedule GET on the loop without waiting (fire-and-forget)
+	#
+	def submit(self, url, timeout=None):
+		return asyncio.run_coroutine_threadsafe(self.get(url, timeout), self.loop)
+
+	#
+	# Request statistics
+	#
+	def stats(self)->dict:
+		return { "requests" : self.requests, "errors" : self.errors, "pending" : self.pending }
+
+	#
+	# Drop all keep-alive connections (e.g. after ip change), a new session is created on the next call
+	#
+	def reset(self):
+		async def close_session():
+			session, self.session = self.session, None
+			if session is not None:
+				await session.close()
+
+		asyncio.run_coroutine_threadsafe(close_session(), self.loop)
+
+	#
+	# Close session and stop loop
+	#
+	def close(self):
+		async def close_session():
+			if self.session is not None:
+				await self.session.close()
+
+		asyncio.run_coroutine_threadsafe(close_session(), self.loop).result(5)
+		self.loop.call_soon_threadsafe(self.loop.stop)
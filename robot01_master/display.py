@@ -1,17 +1,29 @@
 import threading
 import requests
 import time
-import queue
 import base64
+from collections import deque
+
+from http_pool import HTTP_POOL
 
 # url for display action
 display_action_url = '/displayaction?action='
 debug = True
 
-# Queue size
+# Max pending temporary actions, oldest are dropped
 DISPLAY_Q_SIZE = 3
-# Minimal sleep between actions 
+# Minimal time a temporary action is shown before the state is restored (seconds)
 MINIMAL_SLEEP = 1
+# Interval between display calls : measured device latency x factor, bounded (seconds)
+LATENCY_FACTOR = 1.5
+MIN_INTERVAL = 0.05
+MAX_INTERVAL = 1
+# Wait before retrying a failed display call (seconds)
+RETRY_INTERVAL = 1
+# Max retries of a failed temporary action, the desired state is retried until shown
+MAX_RETRIES = 3
+# Smoothing of measured latency (exponential moving average)
+LATENCY_SMOOTHING = 0.2
 
 # Image test bitmap byte size (128x64x8bits)
 IMAGE_BMP_SIZE = 1024
@@ -24,99 +36,172 @@ class imageTestSizeException(Exception):
 		return f"[Error Image bytes invalid ]: {super().__str__()}"
 
 # Class display for driving the led display/face of robot01
-# Uses threading for http call to make it non-blocking
+# A scheduler thread keeps the display in the desired state :
+#	state() sets the desired state, redundant or superseded states are coalesced and only the latest is sent
+#	action() shows a temporary action, after which the desired state is restored
+# Calls are paced by the measured device latency instead of a fixed sleep
 # See below for Actions & Items
 class DISPLAY:
-	def __init__(self, ip, timeout=10):
+	def __init__(self, ip, timeout=10, http=None):
 		# ip of robot/display
 		self.ip = ip
 		# timeout of http request
 		self.timeout = timeout
-		# Latest state (default Neutral)
+		# Keep-alive http connection pool (shared with robot when given)
+		self.http = http if http else HTTP_POOL("display", timeout=timeout)
+		# Latest (desired) state (default Neutral) and state shown on the display
 		self.latest_state = {"type": "state", "action" : 3, "reset" : 0, "img_index" : 0, "text" : ""}
+		self.shown_state = None
 		
 		# health
 		self.health = False
+
+		# Pending temporary actions
+		self.actions = deque(maxlen=DISPLAY_Q_SIZE)
+		# Time until current temporary action is shown
+		self.hold_until = 0
+		self.cond = threading.Condition()
+
+		# Measured device latency (seconds) and statistics
+		self.latency = MIN_INTERVAL
+		self.sent = 0
+		self.coalesced = 0
+		self.dropped = 0
+		# Failed temporary action being retried and its retry count
+		self.retry_task = None
+		self.retries = 0
 		
-		#Queue
-		self.display_q = queue.Queue(maxsize=DISPLAY_Q_SIZE)
-		# Start Queue worker
+		# Start scheduler worker
 		threading.Thread(target=self.handle_actions, daemon=True).start()
 
 	#
-	# Generate Display worker : Actions from queue : display_q
+	# Display scheduler worker
 	#
 	def handle_actions(self):
 		print("DISPLAY worker started.")	
 
 		while True: 
-			task = self.display_q.get()		
-						
-			if task['type'] == "state":
-			
-				self.latest_state = task
-				url = 'http://' + self.ip + display_action_url + str(task['action'])
-
-				# text display
-				if task['action'] == 1 or task['action'] == 2 or task['action'] == 14:
-					url = url + "&text=" + task['text']
-
-				url = url + "&index=" + str(task['img_index'])
-				
-				self.safe_http_call(url)
-										
-			elif  task['type'] == "action":
-				
-				url = 'http://' + self.ip + display_action_url + str(task['action'])
-
-				# text display
-				if task['action'] == 1 or task['action'] == 2 or task['action'] == 14:
-					url = url + "&text='" + task['text']
-
-				url = url + "&index=" + str(task['img_index'])
-
-				self.safe_http_call(url)
-				
-				reset_timer = task['reset']
-				if reset_timer >= MINIMAL_SLEEP:
-					time.sleep(reset_timer - MINIMAL_SLEEP)
-					
-			time.sleep(MINIMAL_SLEEP)
-				
-			self.display_q.task_done()
-
-			# Reset to latest state
-			if self.display_q.empty() and task['type'] == "action":
-				self.display_q.put_nowait(self.latest_state)
+			with self.cond:
+				task = self.next_task()
+				while task is None:
+					self.cond.wait(self.wait_time())
+					task = self.next_task()
+
+				if task['type'] == "action":
+					self.hold_until = time.monotonic() + max(task['reset'], MINIMAL_SLEEP)
+					self.shown_state = None
+				else:
+					self.shown_state = task
+
+			if self.safe_http_call(self.task_url(task)):
+				time.sleep(self.interval())
+			else:
+				# Not shown, retry later
+				with self.cond:
+					if task['type'] == "action":
+						self.hold_until = 0
+						self.retry(task)
+					elif self.shown_state is task:
+						self.shown_state = None
+				time.sleep(RETRY_INTERVAL)
 		
 		print("DISPLAY worker stopped.")	
 
+	#
+	# Requeue failed temporary action at the head, dropped after MAX_RETRIES (cond must be held)
+	#
+	def retry(self, task):
+		if task is self.retry_task:
+			self.retries += 1
+		else:
+			self.retry_task, self.retries = task, 1
+
+		if self.retries > MAX_RETRIES:
+			print("Display action " + str(task['action']) + " dropped after " + str(MAX_RETRIES) + " retries")
+			self.dropped += 1
+			self.retry_task = None
+			return
+
+		# A full queue keeps the older action being retried, the newest pending action is dropped
+		if len(self.actions) == self.actions.maxlen:
+			print("Display action " + str(self.actions[-1]['action']) + " dropped, queue full")
+			self.dropped += 1
+			self.actions.pop()
+		self.actions.appendleft(task)
+
+	#
+	# Next task to send, None when display is up to date or a temporary action is still shown (cond must be held)
+	#
+	def next_task(self)-> any:
+		if time.monotonic() < self.hold_until:
+			return None
+		if self.actions:
+			return self.actions.popleft()
+		if self.shown_state != self.latest_state:
+			return self.latest_state
+		return None
+
+	#
+	# Wait time of scheduler : until end of temporary action, or until notified (cond must be held)
+	#
+	def wait_time(self)-> any:
+		remaining = self.hold_until - time.monotonic()
+		return remaining if remaining > 0 else None
+
+	#
+	# Interval between calls based on measured latency
+	#
+	def interval(self)->float:
+		return min(max(self.latency * LATENCY_FACTOR, MIN_INTERVAL), MAX_INTERVAL)
+
+	#
+	# Url of display task
+	#
+	def task_url(self, task)->str:
+		url = 'http://' + self.ip + display_action_url + str(task['action'])
+
+		# text display
+		if task['action'] == 1 or task['action'] == 2 or task['action'] == 14:
+			url = url + "&text=" + task['text']
+
+		return url + "&index=" + str(task['img_index'])
+
 	#
 	# set state of display
 	#
 	def state(self, action, img_index = 0, text = ""):
-		task = {"type": "state", "action" : action, "img_index" : img_index, "text" : text}
+		task = {"type": "state", "action" : action, "reset" : 0, "img_index" : img_index, "text" : text}
 		
-		try:
-			# Empty the queue
-			while not self.display_q.empty():
-				self.display_q.get()
-
-			# Add state to queue
-			self.display_q.put_nowait(task)
-		except Exception as e:
-			print("Display queue error : ", type(e).__name__ )
+		with self.cond:
+			if self.latest_state != self.shown_state or self.actions:
+				self.coalesced += 1
+			# New state supersedes pending temporary actions
+			self.actions.clear()
+			self.latest_state = task
+			self.cond.notify()
 
 	#
 	# set temporary state of display
 	#
 	def action(self, action, reset=0, img_index = 0, text=""):
 		task = {"type": "action", "action" : action, "reset" : reset, "img_index" : img_index, "text" : text}
-		try:
-			# Add state to queue
-			self.display_q.put_nowait(task)
-		except Exception as e:
-			print("Display queue error : ", type(e).__name__ )
+
+		with self.cond:
+			# Same action already pending
+			if task in self.actions:
+				self.coalesced += 1
+				return
+			if len(self.actions) == self.actions.maxlen:
+				print("Display action " + str(self.actions[0]['action']) + " dropped, queue full")
+				self.dropped += 1
+			self.actions.append(task)
+			self.cond.notify()
+
+	#
+	# Scheduler statistics
+	#
+	def stats(self)->dict:
+		return { "sent" : self.sent, "coalesced" : self.coalesced, "dropped" : self.dropped, "latency" : round(self.latency, 3), "interval" : round(self.interval(), 3) }
 
 	#
 	# Image test
@@ -138,7 +223,7 @@ class DISPLAY:
 		headers = { "Content-Type": "application/octet-stream" }
 		url = 'http://' + self.ip + '/drawbmp'
 		try:
-			response = requests.post(url, data=image_bytes, headers=headers, timeout=self.timeout)
+			response = self.http.post(url, data=image_bytes, headers=headers)
 		except Exception as e:
 			print("Display Request - " + url + " , error : ",e)
 			
@@ -147,15 +232,18 @@ class DISPLAY:
 	#
 	# Safe http call to display
 	#
-	def safe_http_call(self, url):
+	def safe_http_call(self, url)->bool:
 		if self.health:
 			try:
-				response = requests.get(url, timeout=self.timeout)
+				start = time.monotonic()
+				response = self.http.get(url)
+				self.latency = self.latency + LATENCY_SMOOTHING * (time.monotonic() - start - self.latency)
+				self.sent += 1
+				return True
 			except Exception as e:
 				if debug:
 					print("Display Request - " + url + " , error : ",e)
 				else:
 					print("Display Request error")
 
-
-
+		return False
@@ -0,0 +1,137 @@
+import re
+
+# Emotion labels, same set as the LLM expression prompt
+EMOTIONS = ["sad", "happy", "excited", "difficult", "love", "like", "dislike", "interesting", "relieved", "embarrassed", "fear", "neutral"]
+
+# Lexicon : label -> words. Words are matched on the word itself or its stem (see stem())
+LEXICON = {
+	"sad" : ["sad", "sadly", "sorry", "unhappy", "cry", "tear", "lonely", "alone", "miss", "lost", "lose", "grief", "depress", "gloomy", "unfortunate", "unfortunately", "hurt", "pain", "regret", "sorrow", "disappoint", "heartbroken", "die", "dead", "death", "passed"],
+	"happy" : ["happy", "glad", "joy", "joyful", "cheer", "cheerful", "smile", "laugh", "fun", "pleased", "delight", "delighted", "great", "good", "nice", "wonderful", "fantastic", "enjoy", "celebrate", "yay", "hooray", "sunny", "bright", "congratulation"],
+	"excited" : ["excite", "excited", "exciting", "thrill", "thrilled", "amazing", "awesome", "incredible", "wow", "can't wait", "adventure", "eager", "energy", "party", "epic", "spectacular", "stunning"],
+	"difficult" : ["difficult", "hard", "tough", "complicate", "complicated", "complex", "struggle", "problem", "challenge", "challenging", "confuse", "confusing", "tricky", "impossible", "stuck", "unsure", "trouble", "hmm", "puzzle"],
+	"love" : ["love", "lovely", "adore", "darling", "sweetheart", "heart", "hug", "kiss", "care", "cherish", "dear", "affection", "romantic", "beloved", "friend", "friendship"],
+	"like" : ["like", "prefer", "favorite", "favourite", "fond", "appreciate", "cool", "thank", "thanks"],
+	"dislike" : ["dislike", "hate", "awful", "terrible", "horrible", "bad", "disgust", "disgusting", "annoy", "annoying", "boring", "ugly", "gross", "yuck", "worst", "stupid", "nasty", "angry", "mad"],
+	"interesting" : ["interest", "interesting", "curious", "fascinate", "fascinating", "wonder", "intrigue", "intriguing", "learn", "discover", "explore", "question", "think", "idea", "fact", "science", "know", "remarkable", "notice"],
+	"relieved" : ["relieve", "relieved", "relief", "phew", "finally", "safe", "calm", "rest", "relax", "okay now", "glad that", "over", "fixed", "solved", "better"],
+	"embarrassed" : ["embarrass", "embarrassed", "embarrassing", "oops", "ashamed", "shame", "shy", "awkward", "blush", "apologize", "apologise", "apology", "mistake", "silly", "clumsy", "excuse"],
+	"fear" : ["fear", "afraid", "scare", "scared", "scary", "fright", "frightened", "terrify", "terrified", "panic", "danger", "dangerous", "worry", "worried", "nervous", "anxious", "horror", "creepy", "threat", "careful", "alarm"],
+}
+
+# Negation words negate the next emotion words up to the end of the clause : "not X" is not scored as X,
+# it scores the opposite label when there is one (NEGATED), else nothing
+NEGATIONS = {"not", "no", "never", "don't", "dont", "doesn't", "isn't", "aren't", "wasn't", "can't", "cannot", "won't", "hardly", "without"}
+NEGATION_WINDOW = 3
+CLAUSE_DELIMITERS = {",", ".", ";", ":", "!", "?"}
+NEGATED = {"happy" : "sad", "like" : "dislike", "love" : "dislike", "excited" : "neutral", "interesting" : "neutral", "dislike" : "like", "sad" : "relieved", "fear" : "relieved", "difficult" : "relieved"}
+
+# Words weighted more as they are more specific than the rest of the lexicon
+STRONG_WEIGHT = 2
+STRONG_WORDS = {"sad", "happy", "excited", "difficult", "love", "dislike", "hate", "interesting", "relieved", "embarrassed", "afraid", "scared", "fear", "terrified", "amazing", "awesome", "oops", "phew"}
+
+# Generic words, common in plain answers and confirmations, only count together with other emotion words
+WEAK_WEIGHT = 0.5
+WEAK_WORDS = {"good", "great", "nice", "bright", "sunny", "energy", "hard", "problem", "heart", "care", "dear", "friend", "think", "know", "question", "idea", "fact", "learn", "notice", "finally", "safe", "calm", "rest", "over", "better", "lost", "lose", "miss", "alone", "passed", "excuse", "cool"}
+
+# "like" is also a preposition ("a robot like me"), the bare word only counts as a verb :
+# after a subject or adverb ("I like", "really like"), or before it/them ("like it"). likes, liked always count
+LIKE_BEFORE = {"i", "you", "we", "they", "he", "she", "really", "also", "just", "totally", "always", "do", "does", "did", "not", "don't", "dont", "doesn't", "didn't", "never"}
+LIKE_AFTER = {"it", "them"}
+
+# Min score of the best label, below it the text is neutral
+MIN_SCORE = 1
+
+# Exclamation marks add to excited
+EXCLAMATION_WEIGHT = 0.5
+
+# Stem : strip common suffixes
+SUFFIXES = ("ingly", "ing", "edly", "ed", "ness", "ful", "ly", "es", "s")
+
+# Words and clause delimiters
+WORD_RE = re.compile(r"[a-z']+|[,.;:!?]")
+
+def stem(word)->str:
+	for suffix in SUFFIXES:
+		if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+			return word[:-len(suffix)]
+	return word
+
+# Class EMOTION_CLASSIFIER : lexicon based emotion scorer, runs in-process
+# classify(text) returns one of EMOTIONS
+class EMOTION_CLASSIFIER:
+	def __init__(self, lexicon=LEXICON):
+		self.words = {}
+		self.phrases = []
+
+		for label, words in lexicon.items():
+			for word in words:
+				if " " in word:
+					self.phrases.append((word, label))
+				else:
+					weight = STRONG_WEIGHT if word in STRONG_WORDS else WEAK_WEIGHT if word in WEAK_WORDS else 1
+					self.words[word] = (label, weight)
+					self.words.setdefault(stem(word), (label, weight))
+
+	#
+	# Label and weight of word, tries the word, its stem and its stem with a silent e (loved -> love)
+	#
+	def lookup(self, token)-> any:
+		match = self.words.get(token)
+		if match is None:
+			root = stem(token)
+			match = self.words.get(root) or self.words.get(root + "e")
+		return match
+
+	#
+	# Scores per label
+	#
+	def scores(self, text)->dict:
+		text = text.lower()
+		scores = {}
+
+		for phrase, label in self.phrases:
+			if phrase in text:
+				scores[label] = scores.get(label, 0) + 1
+
+		negated = 0
+		tokens = WORD_RE.findall(text)
+		for i, token in enumerate(tokens):
+			if token in CLAUSE_DELIMITERS:
+				negated = 0
+				continue
+			if token in NEGATIONS:
+				negated = NEGATION_WINDOW
+				continue
+
+			match = self.lookup(token) if token != "like" or self.like_verb(tokens, i) else None
+			if match:
+				label, weight = match
+				if negated:
+					label = NEGATED.get(label)
+				if label:
+					scores[label] = scores.get(label, 0) + weight
+
+			if negated:
+				negated -= 1
+
+		if "!" in text:
+			scores["excited"] = scores.get("excited", 0) + EXCLAMATION_WEIGHT * min(text.count("!"), 3)
+
+		return scores
+
+	#
+	# True when "like" at index i of tokens is used as a verb
+	#
+	def like_verb(self, tokens, i)->bool:
+		return (i > 0 and tokens[i - 1] in LIKE_BEFORE) or (i + 1 < len(tokens) and tokens[i + 1] in LIKE_AFTER)
+
+	#
+	# Emotion of text, neutral when nothing matches or only generic words do
+	#
+	def classify(self, text)->str:
+		scores = self.scores(text)
+		if not scores or max(scores.values()) < MIN_SCORE:
+			return "neutral"
+
+		# Ties resolved by order of EMOTIONS
+		return max(EMOTIONS, key=lambda label: scores.get(label, 0))
@@ -0,0 +1,106 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+# Connection pool sizes (per device)
+POOL_CONNECTIONS = 1
+POOL_MAXSIZE = 4
+# Block when the pool is exhausted instead of opening extra connections
+POOL_BLOCK = True
+
+# Default timeout for http calls (seconds)
+DEFAULT_TIMEOUT = 2
+
+# Class HTTP_POOL : keep-alive http session for one device (ESP32)
+# Connections are pooled and reused between calls, timeouts can be set per endpoint
+#
+# timeouts : dict of endpoint path prefix -> timeout in seconds. Longest matching prefix wins
+#
+class HTTP_POOL:
+	def __init__(self, name, timeout=DEFAULT_TIMEOUT, timeouts=None, pool_maxsize=POOL_MAXSIZE):
+		self.name = name
+		self.timeout = timeout
+		self.timeouts = timeouts if timeouts else {}
+
+		self.adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize, pool_block=POOL_BLOCK, max_retries=0)
+		self.session = requests.Session()
+		self.session.mount("http://", self.adapter)
+
+		# Request counters
+		self.lock = threading.Lock()
+		self.requests = 0
+		self.errors = 0
+
+	#
+	# Timeout for endpoint (url path)
+	#
+	def endpoint_timeout(self, url)->float:
+		path = urlsplit(url).path
+		timeout = self.timeout
+		match = ""
+		for prefix in self.timeouts:
+			if path.startswith(prefix) and len(prefix) > len(match):
+				match = prefix
+				timeout = self.timeouts[prefix]
+
+		return timeout
+
+	#
+	# GET request, raises on error
+	#
+	def get(self, url, timeout=None)-> any:
+		return self.request("GET", url, timeout=timeout)
+
+	#
+	# POST request, raises on error
+	#
+	def post(self, url, data=None, headers=None, timeout=None)-> any:
+		return self.request("POST", url, data=data, headers=headers, timeout=timeout)
+
+	#
+	# Request via the pooled session
+	#
+	def request(self, method, url, timeout=None, **kwargs)-> any:
+		if timeout is None:
+			timeout = self.endpoint_timeout(url)
+
+		with self.lock:
+			self.requests += 1
+
+		try:
+			return self.session.request(method, url, timeout=timeout, **kwargs)
+		except Exception:
+			with self.lock:
+				self.errors += 1
+			raise
+
+	#
+	# Connection statistics : opened vs reused connections
+	#
+	def stats(self)->dict:
+		opened = 0
+		served = 0
+		pools = self.adapter.poolmanager.pools
+		for key in list(pools.keys()):
+			pool = pools.get(key)
+			if pool is None:
+				continue
+			opened += pool.num_connections
+			served += pool.num_requests
+
+		with self.lock:
+			status = {
+				"requests" : self.requests,
+				"errors" : self.errors,
+				"connections_opened" : opened,
+				"connections_reused" : max(served - opened, 0),
+			}
+
+		return status
+
+	#
+	# Drop all pooled connections (e.g. after ip change)
+	#
+	def reset(self):
+		self.adapter.poolmanager.clear()
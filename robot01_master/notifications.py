@@ -0,0 +1,145 @@
+import time
+import queue
+import asyncio
+import threading
+
+# Max queued notifications per subscriber, oldest are dropped
+SUBSCRIBER_Q_SIZE = 32
+# Recent notifications kept for reporting
+HISTORY_SIZE = 20
+
+# Class NOTIFICATION : typed notification received from the robot
+# Messages are <kind>_<status>, e.g. walking_blocked -> kind "walking", status "blocked",
+# turn_sensor_error -> kind "turn", status "sensor_error"
+class NOTIFICATION:
+	def __init__(self, message):
+		self.message = message
+		self.kind, sep, self.status = message.partition("_")
+		self.time = time.time()
+
+	#
+	# Match on kind and/or status (None matches anything)
+	#
+	def matches(self, kind=None, status=None)->bool:
+		if kind is not None and self.kind != kind:
+			return False
+		if status is not None and self.status not in ([status] if isinstance(status, str) else status):
+			return False
+		return True
+
+	def to_dict(self)->dict:
+		return { "message" : self.message, "kind" : self.kind, "status" : self.status, "time" : self.time }
+
+	def __repr__(self)->str:
+		return "NOTIFICATION(" + self.message + ")"
+
+# Class SUBSCRIPTION : queue of notifications matching a filter
+# Subscribe before sending the command that triggers the notification, so it can not be missed.
+# Use as context manager to unsubscribe when done.
+class SUBSCRIPTION:
+	def __init__(self, bus, kind=None, status=None):
+		self.bus = bus
+		self.kind = kind
+		self.status = status
+		self.q = queue.Queue(maxsize=SUBSCRIBER_Q_SIZE)
+
+	#
+	# Queue notification when it matches, called by the bus
+	#
+	def put(self, notification):
+		if not notification.matches(self.kind, self.status):
+			return
+		try:
+			self.q.put_nowait(notification)
+		except queue.Full:
+			# Slow subscriber, drop oldest
+			try:
+				self.q.get_nowait()
+			except queue.Empty:
+				pass
+			self.q.put_nowait(notification)
+
+	#
+	# Wait for next matching notification, returns None on timeout
+	#
+	def wait(self, timeout=None)-> any:
+		try:
+			return self.q.get(timeout=timeout)
+		except queue.Empty:
+			return None
+
+	#
+	# Awaitable wait, the event loop is not blocked
+	#
+	async def wait_async(self, timeout=None)-> any:
+		return await asyncio.to_thread(self.wait, timeout)
+
+	def close(self):
+		self.bus.unsubscribe(self)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+# Class NOTIFICATION_BUS : publish notifications from the robot to any number of subscribers
+class NOTIFICATION_BUS:
+	def __init__(self, history=HISTORY_SIZE):
+		self.lock = threading.Lock()
+		self.subscribers = []
+		self.history = []
+		self.history_size = history
+		self.published = 0
+
+	#
+	# Subscribe to notifications matching kind and/or status
+	#
+	def subscribe(self, kind=None, status=None)->SUBSCRIPTION:
+		subscription = SUBSCRIPTION(self, kind, status)
+		with self.lock:
+			self.subscribers.append(subscription)
+		return subscription
+
+	def unsubscribe(self, subscription):
+		with self.lock:
+			if subscription in self.subscribers:
+				self.subscribers.remove(subscription)
+
+	#
+	# Publish message to all subscribers
+	#
+	def publish(self, message)->NOTIFICATION:
+		notification = NOTIFICATION(message)
+		with self.lock:
+			self.published += 1
+			self.history.append(notification)
+			del self.history[:-self.history_size]
+			subscribers = list(self.subscribers)
+
+		for subscription in subscribers:
+			subscription.put(notification)
+
+		return notification
+
+	#
+	# Wait for a notification matching kind and/or status published from now on, returns None on timeout
+	#
+	def wait_for(self, kind=None, status=None, timeout=None)-> any:
+		with self.subscribe(kind, status) as subscription:
+			return subscription.wait(timeout)
+
+	async def wait_for_async(self, kind=None, status=None, timeout=None)-> any:
+		with self.subscribe(kind, status) as subscription:
+			return await subscription.wait_async(timeout)
+
+	#
+	# Recent notifications
+	#
+	def recent(self)->list:
+		with self.lock:
+			return [notification.to_dict() for notification in self.history]
+
+	def stats(self)->dict:
+		with self.lock:
+			return { "published" : self.published, "subscribers" : len(self.subscribers) }
@@ -2,9 +2,10 @@ import threading
 import requests
 import time
 import queue
-from queue import PriorityQueue
+from threading import Timer
 
 import socket
+import json
 import random
 import ollama
 import numpy as np
@@ -12,37 +13,74 @@ import numpy as np
 from ping3 import ping, verbose_ping
 
 from tts_engine import TTS
+from tts_speecht5 import voice as TTS_VOICE
 from display import DISPLAY
 from sense import SENSE
+from http_pool import HTTP_POOL
+from device_client import DEVICE_CLIENT
+from emotion import EMOTION_CLASSIFIER, EMOTIONS
+from audio_transport import PCM16_BUFFER, AUDIO_PACER, SILENCE_PACKET
+from sensor_sampler import SENSOR_SAMPLER, SENSOR_RATE
+from body_scheduler import BODY_SCHEDULER, PRIORITY_GESTURE
 
 debug = False
 
 LLM_EXPRESSION_MODEL = "gemma2:2b"
+# Emotion detection : "classifier" (local lexicon) or "llm" (LLM_EXPRESSION_MODEL)
+EMOTION_MODE = "classifier"
+
+# Emotion expression : emotion -> (display image index, body action, direction (None = random), value)
+EMOTION_ACTIONS = {
+	"sad" : (8, 16, None, 20),
+	"happy" : (5, 17, None, 30),
+	"excited" : (2, 11, 0, 4),
+	"difficult" : (9, 16, 1, 15),
+	"love" : (6, 17, None, 20),
+	"like" : (2, 17, None, 20),
+	"dislike" : (3, 16, None, 20),
+	"interesting" : (9, 17, None, 15),
+	"fear" : (13, 16, None, 10),
+	"embarrassed" : (12, 17, None, 10),
+	"relieved" : (11, 17, None, 10),
+	"neutral" : None,
+}
 
-# Body actions Queue size
-BODY_Q_SIZE = 6
-# Minimal sleep between actions 
-MINIMAL_SLEEP = 1
 # Audio UDP PORT
 AUDIO_TCP_PORT = 9000
 # output Queue size
 OUTPUT_Q_SIZE = 6
+# Idle time after playback before output is stopped (face, mic), bridges synthesis of the next sentence (seconds)
+OUTPUT_IDLE_GRACE = 3
+# Max wait for the next block of an open stream, a stalled stream is closed (seconds)
+OUTPUT_STREAM_TIMEOUT = 15
 # Health check interval (seconds)
 HEALTH_CHECK_INTERVAL = 5
+# Http timeouts (seconds), default and per endpoint
+HTTP_TIMEOUT = 2
+HTTP_ENDPOINT_TIMEOUTS = { "/displayaction" : 10, "/drawbmp" : 10 }
+# Max age of sampled sensor readings before fetching from the robot (seconds)
+SENSOR_MAX_AGE = 1
 
 # Class robot for managing the robot motors, audio and sensors
-# Uses threading for http call to make it non-blocking
+# Uses the async device client for http calls to make it non-blocking
 #
 class ROBOT:
-	def __init__(self, ip, sense_ip):
+	def __init__(self, ip, sense_ip, tts_voice=TTS_VOICE, sensor_rate=SENSOR_RATE, notifications=None):
 
 		self.ip = ip
+
+		# Keep-alive http connection pool, shared with display (same device)
+		self.http = HTTP_POOL("robot01", timeout=HTTP_TIMEOUT, timeouts=HTTP_ENDPOINT_TIMEOUTS)
+		# Async client for non-blocking calls, one event loop shared with sense
+		self.client = DEVICE_CLIENT(timeout=HTTP_TIMEOUT)
 		
 		# Prepare socket
 		self.audio_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 		self.audio_socket.settimeout(5)
 
 		self.emotion = True
+		self.emotion_mode = EMOTION_MODE
+		self.emotion_classifier = EMOTION_CLASSIFIER()
 		self.output_busy = False
 
 		# health 
@@ -54,26 +92,35 @@ class ROBOT:
 		threading.Thread(target=self.health_check_worker, daemon=True).start()
 
 		# Sense engine
-		self.sense = SENSE(sense_ip)
+		self.sense = SENSE(sense_ip, client=self.client)
 
 		# Display engine
-		self.display = DISPLAY(self.ip)
+		self.display = DISPLAY(self.ip, http=self.http)
 		self.display.state(20) # Show hour glass animation
 				
 		# Motion sensor
 		self.motionsensor = {};
 		# Forward distance clearance sensor
 		self.distance_sensor = {};
+		# Background sensor sampler (ring buffer of readings)
+		self.sensors = SENSOR_SAMPLER(self.fetch_sensors, rate=sensor_rate)
+		self.sensors.start()
 		
 		# output queue
 		self.output_q = queue.Queue(maxsize=OUTPUT_Q_SIZE)
-
-		#Queue
-		self.body_q = queue.Queue(maxsize=BODY_Q_SIZE)
-		
-		# Start actions Queue worker
+		# Preallocated PCM16 buffer for output worker
+		self.pcm = PCM16_BUFFER()
+		# Real-time pacing and device buffer accounting
+		self.pacer = AUDIO_PACER()
+		# Streamed utterance in progress
+		self.stream_open = False
+		# Output held open while a response is generated (no output stopped in between sentences)
+		self.output_hold = False
+		self.output_started_time = 0
+
+		# Body actions scheduler, walk/turn complete on robot notifications
 		self.robot_actions = True
-		threading.Thread(target=self.bodyactions_worker, daemon=True).start()
+		self.body = BODY_SCHEDULER(self.bodyaction_send, notifications)
 
 		# If allowed to walk
 		self.agent_walking = False
@@ -83,7 +130,7 @@ class ROBOT:
 		threading.Thread(target=self.output_worker, daemon=True).start()
 
 		# tts engine
-		self.tts_engine = TTS(self.ip, self.output_q)
+		self.tts_engine = TTS(self.ip, self.output_q, tts_voice)
 		self.tts_engine.start()
 	
 	#	
@@ -117,64 +164,24 @@ class ROBOT:
 		print("Robot health check worker started.")	
 
 	#
-	# Bodyactions workerGenerate Process body_q queue items
+	# Send bodyaction to robot, used by the body scheduler
 	#
-	def bodyactions_worker(self):
-		print("Body actions worker started.")	
-		while self.robot_actions:	
-			task = self.body_q.get()
-			if not self.robot_actions:
-				break
-
-			url = "/bodyaction?action=" + str(task['action']) + "&direction=" + str(task['direction']) + "&value=" + str(task['value'])
-			print("Robot action : " + url )
-
-			response = self.robot_http_call(url)
-
-			time.sleep(MINIMAL_SLEEP)	
-			if not self.body_q.empty():
-				self.body_q.task_done()			
-
-		print("Body actions worker stopped.")	
+	def bodyaction_send(self, url)->bool:
+		return self.robot_http_call(url) is not None
 
 	#
-	# Bodyactions set state of worker
+	# Bodyactions set state of scheduler, disabling stops the robot
 	#
 	def bodyactions_set_state(self, running):
-		if running:
-			self.body_q = queue.Queue(maxsize=BODY_Q_SIZE)
-			self.robot_actions = True
-			threading.Thread(target=self.bodyactions_worker, daemon=True).start()
-		else:
-			self.robot_actions = False
-			self.body_q.put({}) # dummy value	
-			# Stop action to robot
-			url = "/bodyaction?action=12&direction=0&value=0"
-	
-			response = self.robot_http_call(url)
+		self.robot_actions = running
+		self.body.set_enabled(running)
 		
 	#
-	# Bodyaction : Put bodyaction in queue. Action 12 - immediate stop
-	#
-	def bodyaction(self, action, direction, value):
-		# stop immediately
-		if action == 12:
-			print("Robot bodyactions immediate stop.")
-			# empty queue
-			self.bodyactions_set_state(False)
-			url = "/bodyaction?action=12&direction=0&value=0"
-			response = self.robot_http_call(url)
-			time.sleep(3)
-			self.bodyactions_set_state(True)
-						
-			return
-
-		if self.robot_actions:
-			try:
-				task = { "action" : action, "direction" : direction, "value" : value }
-				self.body_q.put_nowait(task)
-			except Exception as e:
-				print("Robot bodyactions queue error : ", type(e).__name__ )
+	# Bodyaction : Schedule bodyaction, returns completion future. Action 12 - immediate stop
+	# Priority : stop > locomotion > gestures (see body_scheduler)
+	#
+	def bodyaction(self, action, direction, value, priority=None):
+		return self.body.schedule(action, direction, value, priority)
 
 	#
 	# Get Output worker status
@@ -198,13 +205,14 @@ class ROBOT:
 
 		# Start output
 		if on:
-			threading.Thread(target=self.robot_http_call, args=[('/audiostream?on=1')]).start()
+			self.robot_http_send('/audiostream?on=1')
 
 			if not self.tts_engine.running:
 				self.tts_engine.start()
 
 			if not self.output_worker_running :
 				self.output_q = queue.Queue(maxsize=OUTPUT_Q_SIZE)
+				self.stream_open = False
 				self.tts_engine.output_q = self.output_q # Reestablish reference
 				self.output_worker_running = True
 				threading.Thread(target=self.output_worker, daemon=True).start()
@@ -215,7 +223,7 @@ class ROBOT:
 		else:
 			self.output_worker_running = False
 			self.output_q.put({}) # dummy value
-			threading.Thread(target=self.robot_http_call, args=[('/audiostream?on=0' )]).start()
+			self.robot_http_send('/audiostream?on=0')
 			self.tts_engine.stop()
 			self.audio_socket.close()
 
@@ -226,7 +234,8 @@ class ROBOT:
 	#
 	# Output worker : Gets output action from queue : output_q
 	# Checks for TTS action, include emotion response
-	# sends audio over TCP
+	# sends audio over TCP at real-time rate, streamed speech blocks are sent as soon as they arrive
+	# Playback finished fires when the device buffer is drained and nothing new is queued
 	#
 	def output_worker(self):
 		print("Robot output engine started")			
@@ -235,56 +244,97 @@ class ROBOT:
 			# Try to connect
 			if not self.connect_tcp_audio():
 				return
-						
-			output_action = self.output_q.get()
+
+			try:
+				output_action = self.output_q.get(timeout=self.playback_remaining())
+			except queue.Empty:
+				if self.stream_open:
+					# Final block never came (dropped on a full queue)
+					print("Output stream stalled, closing stream")
+					self.stream_open = False
+					continue
+				self.playback_finished()
+				continue
 			
 			if not self.output_worker_running:
 				break
 			
+			# Speech of a cancelled generation (see TTS.cancel), unstamped actions belong to the current one
+			generation = output_action.get('generation', self.tts_engine.generation)
+			if generation != self.tts_engine.generation:
+				self.output_q.task_done()
+				continue
+
 			if "audio" in output_action:
-				audio = output_action['audio']
-				
-				# Convert to PCM16le
-				audio = np.asarray(audio * 32767, dtype="<i2")
+				# Convert to PCM16le in place, frames are views on the buffer
+				samples = self.pcm.convert(output_action['audio'])
 
-				for x in range(0, audio.shape[0],1024):
+				for frame in self.pcm.frames(samples):
 				
 					if "speech" in output_action['type'] and not self.output_busy:
 						self.output_started()
-							
-					start = x
-					end = x + 1024
-
-					try :
-						self.audio_socket.sendall(audio[start:end].tobytes())
-					except Exception as e:
-						print("Sending TCP audio error : " + self.ip + ":" + str(AUDIO_TCP_PORT) + " " + str(e))
-						self.audio_socket.close()
+
+					if not self.send_audio(frame, len(frame) // 2):
 						break
 
-					if not self.output_worker_running:
+					if not self.output_worker_running or generation != self.tts_engine.generation:
 						break
 	
-			if "text" in output_action:
+			if "text" in output_action and generation == self.tts_engine.generation:
 				print("From output worker : " + output_action['text'])
-				threading.Thread(target=self.express_emotion,args=[output_action['text']],daemon=True).start()
+				if self.emotion_mode == "llm":
+					threading.Thread(target=self.express_emotion,args=[output_action['text']],daemon=True).start()
+				else:
+					self.express_emotion(output_action['text'])
 
 			self.output_q.task_done()
 			
+			# Streamed speech blocks : keep the stream open until the final block
+			self.stream_open = not output_action.get('final', True) and generation == self.tts_engine.generation
+			if self.stream_open:
+				continue
+
 			if self.output_q.empty():
-				# Flush buffer with empty packets
+				# Flush device buffer with empty packets
 				for i in range(0, 4):
-					try :
-						self.audio_socket.sendall( bytes(1024) )
-					except Exception as e:
-						print("Sending TCP audio error : " + self.ip + ":" + str(AUDIO_TCP_PORT) + " " + str(e))
-						self.audio_socket.close()
+					if not self.send_audio(SILENCE_PACKET, len(SILENCE_PACKET) // 2):
 						break
-			
-				self.output_stopped()
 
+		self.pacer.finish()
 		print("Robot output engine stopped")			
 
+	#
+	# Send audio paced at real-time rate
+	#
+	def send_audio(self, data, samples)->bool:
+		self.pacer.wait(samples)
+		try :
+			self.audio_socket.sendall(data)
+			self.pacer.sent(samples)
+			return True
+		except Exception as e:
+			print("Sending TCP audio error : " + self.ip + ":" + str(AUDIO_TCP_PORT) + " " + str(e))
+			self.audio_socket.close()
+			return False
+
+	#
+	# Wait time for the next output action : stream timeout while a stream is open,
+	# audio left on device plus idle grace while playing, None when nothing is playing
+	#
+	def playback_remaining(self)-> any:
+		if self.stream_open:
+			return OUTPUT_STREAM_TIMEOUT
+		if not self.pacer.playing.is_set():
+			return None
+		return self.pacer.remaining() + OUTPUT_IDLE_GRACE
+
+	#
+	# Playback finished : device buffer drained and idle grace passed
+	#
+	def playback_finished(self):
+		self.pacer.finish()
+		self.output_stopped()
+
 	#
 	# Connect TCP audio
 	#
@@ -317,6 +367,7 @@ class ROBOT:
 	#
 	def output_started(self):
 		self.output_busy = True
+		self.output_started_time = time.monotonic()
 		if not self.sense.mic: 
 			self.sense.micstreaming(0)
 			
@@ -326,12 +377,7 @@ class ROBOT:
 	# Callback : Stopped output
 	#
 	def output_stopped(self):
-		n = 0
-		while self.output_q.empty() and n < 3:
-			time.sleep(1);
-			n += 1
-		
-		if self.output_q.empty():
+		if self.output_q.empty() and not self.output_hold:
 			self.display.state(3)
 			self.bodyaction(16,0,30)
 			self.bodyaction(17,0,30)
@@ -341,6 +387,35 @@ class ROBOT:
 
 			self.output_busy = False
 
+	#
+	# Hold output open while a response is generated, on release stop output when everything is played
+	#
+	def hold_output(self, hold):
+		self.output_hold = hold
+		if not hold and self.output_busy and not self.pacer.playing.is_set() and self.output_q.empty() and self.tts_engine.idle():
+			self.output_stopped()
+
+	#
+	# Cancel output : discard pending texts, queued speech and cut the utterance being sent
+	# Speech still being synthesized is stamped with the old generation and dropped by the output worker
+	#
+	def cancel_output(self):
+		self.tts_engine.cancel()
+		while True:
+			try:
+				self.output_q.get_nowait()
+				self.output_q.task_done()
+			except queue.Empty:
+				break
+
+		# Close a streamed utterance so playback finished fires
+		if self.stream_open:
+			self.stream_open = False
+			try:
+				self.output_q.put_nowait({"type" : "speech", "final" : True})
+			except queue.Full:
+				pass
+
 	#
 	# Set/Get volume
 	#
@@ -354,10 +429,11 @@ class ROBOT:
 				return ""
 			return json_obj['volume']
 		else:
-			threading.Thread(target=self.robot_http_call, args=[('/volume?power=' + str(set_volume) )]).start()
+			self.robot_http_send('/volume?power=' + str(set_volume))
 
 	#
-	# Robotic expression via a LLM based on sentence
+	# Robotic expression based on sentence
+	# Emotion from the local classifier, or from a LLM when emotion_mode is "llm"
 	#
 	def express_emotion(self,text):
 
@@ -366,104 +442,78 @@ class ROBOT:
 			
 		if len(text) < 30:
 			return
-			
-		prompt = """Try to match the emotion or expression in the text as much as possible with of one the following words:
-		sad, happy, excited, difficult, love, like, dislike, interesting, relieved, embarrassed, fear or neutral. 
-		Your results should only be that word, no explanation.
-		The text is : """ + text
 
-		response = ollama.chat(
-			model = LLM_EXPRESSION_MODEL,
-			keep_alive = -1,
-			messages=[{'role': 'user', 'content': prompt}],
-		)
-		
-		emotion =  response['message']['content'].lower()
+		if self.emotion_mode == "llm":
+			emotion = self.llm_emotion(text)
+		else:
+			emotion = self.emotion_classifier.classify(text)
 		
 		print("Robot expression: " + emotion)
-		
-		# Random motion directions
-		d1 = random.randint(0, 1)
-		d2 = random.randint(0, 1)
-
-		if "sad" in emotion:
-			self.display.action(12,1,8)
-			self.bodyaction(16,d1,20)
-			
-			return
-		elif "happy" in emotion:
-			self.display.action(12,1,5)
-			self.bodyaction(17,d2,30)
 
+		if emotion not in EMOTION_ACTIONS:
 			return
-		elif "excited" in emotion:
-			self.display.action(12,1,2)
-			self.bodyaction(11,0,4)
 
+		if emotion == "neutral":
+			# Drop pending gestures, locomotion is not affected
+			self.body.cancel(PRIORITY_GESTURE)
+			Timer(2, self.neutral_pose).start()
 			return
-		elif "difficult" in emotion:
-			self.display.action(12,1,9)
-			self.bodyaction(16,1,15)
 
-			return
-		elif "love" in emotion:
-			self.display.action(12,1,6)
-			self.bodyaction(17,d1,20)
-
-		elif "like" in emotion:
-			self.display.action(12,1,2)
-			self.bodyaction(17,d1,20)
-
-			return
-		elif "dislike" in emotion:
-			self.display.action(12,1,3)
-			self.bodyaction(16,d1,20)
-
-			return
-		elif "interesting" in emotion:
-			self.display.action(12,1,9)
-			self.bodyaction(17,d2,15)
-
-			return
+		display_index, body_action, direction, value = EMOTION_ACTIONS[emotion]
+		# Random motion direction
+		if direction is None:
+			direction = random.randint(0, 1)
 
-		elif "fear" in emotion:
-			self.display.action(12,1,13)
-			self.bodyaction(16,d2,10)
+		self.display.action(12,1,display_index)
+		self.bodyaction(body_action,direction,value,PRIORITY_GESTURE)
 
-			return
-
-		elif "embarrassed" in emotion:
-			self.display.action(12,1,12)
-			self.bodyaction(17,d2,10)
-
-			return
+	#
+	# Neutral pose after emotion expression
+	#
+	def neutral_pose(self):
+		self.bodyaction(16,0,30,PRIORITY_GESTURE)
+		self.bodyaction(17,0,30,PRIORITY_GESTURE)
 
-		elif "relieved" in emotion:
-			self.display.action(12,1,11)
-			self.bodyaction(17,d2,10)
+	#
+	# Emotion of text via a LLM (fallback mode)
+	#
+	def llm_emotion(self, text)->str:
+		prompt = """Try to match the emotion or expression in the text as much as possible with of one the following words:
+		sad, happy, excited, difficult, love, like, dislike, interesting, relieved, embarrassed, fear or neutral. 
+		Your results should only be that word, no explanation.
+		The text is : """ + text
 
-			return
+		response = ollama.chat(
+			model = LLM_EXPRESSION_MODEL,
+			keep_alive = -1,
+			messages=[{'role': 'user', 'content': prompt}],
+		)
+		
+		response = response['message']['content'].lower()
 
-		elif "neutral" in emotion:
-			self.bodyactions_set_state(False)
-			time.sleep(2)
-			self.bodyactions_set_state(True)
-			self.bodyaction(16,0,30)
-			self.bodyaction(17,0,30)
+		# Longest label first, "dislike" contains "like"
+		for emotion in sorted(EMOTIONS, key=len, reverse=True):
+			if emotion in response:
+				return emotion
 
-			return
+		return response
 
 	#
 	# wakeupsense : Give signal to io pin for waking up sense device
 	#
 	def wakeupsense(self):
-		threading.Thread(target=self.robot_http_call, args=[('/wakeupsense')]).start()
+		self.robot_http_send('/wakeupsense')
 		print("Sense Wake up signal send.")
 		
 	#
 	# distanceSensor_info : Get distance / ToF sensor info
 	#
-	def distanceSensor_info(self)->dict:
+	def distanceSensor_info(self, max_age=SENSOR_MAX_AGE)->dict:
+		# Sampled reading when recent enough
+		reading = self.sensors.latest("distance", max_age)
+		if reading is not None:
+			return reading
+
 		response = self.robot_http_call('/distanceSensor_info')
 		if self.health:	
 			try: 
@@ -477,7 +527,12 @@ class ROBOT:
 	#
 	# motionSensor_info : Get motion/gyro sensor data
 	#
-	def motionSensor_info(self)->dict:
+	def motionSensor_info(self, max_age=SENSOR_MAX_AGE)->dict:
+		# Sampled reading when recent enough
+		reading = self.sensors.latest("motion", max_age)
+		if reading is not None:
+			return reading
+
 		response = self.robot_http_call('/motionSensor_info')
 		if self.health:	
 			try: 
@@ -487,11 +542,46 @@ class ROBOT:
 				return 0
 			return self.motionsensor
 
+	#
+	# Fetch motion and distance sensors concurrently, used by the sensor sampler
+	#
+	def fetch_sensors(self)->tuple:
+		if not self.health:
+			return None, None
+
+		futures = [self.client.submit("http://" + self.ip + url, self.http.endpoint_timeout(url)) for url in ['/motionSensor_info', '/distanceSensor_info']]
+		readings = []
+		for future in futures:
+			try:
+				body = future.result(HTTP_TIMEOUT + 1)
+				readings.append(json.loads(body) if body else None)
+			except Exception as e:
+				if debug:
+					print("Sensor fetch error : ", e)
+				readings.append(None)
+
+		if readings[0]:
+			self.motionsensor = readings[0]
+		if readings[1]:
+			self.distance_sensor = readings[1]
+
+		return readings[0], readings[1]
+
+	#
+	# Change ip of robot, connections to the old device are dropped (display shares the http pool)
+	#
+	def set_ip(self, ip):
+		self.ip = ip
+		self.display.ip = ip
+		self.http.reset()
+		self.client.reset()
+		self.audio_socket.close()
+
 	#
 	# Reset robot
 	#
 	def reset(self):
-		threading.Thread(target=self.robot_http_call, args=[('/reset')]).start()
+		self.robot_http_send('/reset')
 		print("Robot01 reset send")
 		reset = {"reset":"ok"}
 		return
@@ -500,18 +590,28 @@ class ROBOT:
 	# Erase/wipe config of robot
 	#
 	def erase_config(self):
-		threading.Thread(target=self.robot_http_call, args=[('/eraseconfig')]).start()
+		self.robot_http_send('/eraseconfig')
 		print("Robot01 erase config send")
 		reset = {"erase":"ok"}
 		return
 
+	#
+	# Non-blocking http call to robot, returns future
+	#
+	def robot_http_send(self, url)-> any:
+		if self.health:
+			url = "http://" + self.ip + url
+			return self.client.submit(url, self.http.endpoint_timeout(url))
+
+		return
+
 	#
 	# Safe http call to robot
 	#
 	def robot_http_call(self, url)-> any:
 		if self.health:
 			try:
-				response = requests.get("http://" + self.ip + url, timeout=2)
+				response = self.http.get("http://" + self.ip + url)
 				return response
 			except Exception as e:
 				if debug:
@@ -1,5 +1,5 @@
 import os
-from flask import Flask, send_from_directory, render_template, jsonify, request, abort
+from flask import Flask, send_from_directory, render_template, jsonify, request, abort, Response
 import logging
 from werkzeug.serving import WSGIRequestHandler
 
@@ -244,20 +244,12 @@ def stop():
 @app.route('/api/bodyaction', methods=['GET'])
 def bodyaction():
 
-	if "action" in request.args:
-		action = request.args.get('action')
-	else:
-		action = 0
-		
-	if "direction" in request.args:
-		direction = request.args.get('direction')
-	else:
-		direction = 0
-
-	if "steps" in request.args:
-		steps = request.args.get('steps')
-	else:
-		steps = 0
+	try:
+		action = int(request.args.get('action', 0))
+		direction = int(request.args.get('direction', 0))
+		steps = int(request.args.get('steps', 0))
+	except ValueError as e:
+		abort(400, description=str(e))
 
 	brain.robot.bodyaction(action,direction,steps)
 
@@ -368,21 +360,27 @@ def get_setting():
 
 #
 # Capture an image with the camera
-# GET api/img_capture
-# Return image in base 64.
+# GET api/img_capture?res=8&format=jpeg
+# Return image in base 64, or the JPEG image itself with format=jpeg
 #
-# Return base64 string 
+# Return base64 string or image/jpeg
 #
 @app.route('/api/img_capture', methods=['GET'])
 def img_capture():
 	try:
 		res = request.args.get('res')
-		img = brain.robot.sense.capture(res)
+		jpeg = brain.robot.sense.capture_jpeg(res)
 	except Exception as e:
 		print(e)
 		abort(500, description=str(e))
 
-	return img
+	if request.args.get('format') == "jpeg":
+		if not jpeg:
+			abort(503, description="No image captured")
+		return Response(jpeg, mimetype="image/jpeg", headers={"Cache-Control": "no-store"})
+
+	# Encoded here, only for clients that need text
+	return base64.b64encode(jpeg).decode("ascii") if jpeg else ""
 
 #
 # Get distance Sensor sensor readings
@@ -416,6 +414,25 @@ def motionSensor_info():
 
 	return jsonify(info)
 
+#
+# Sensor history (yaw, pitch, roll, distance) from the background sampler
+# GET api/sensor_history?seconds=60&points=120
+#
+# Return json response
+#
+@app.route('/api/sensor_history', methods=['GET'])
+def sensor_history():
+	try:
+		seconds = float(request.args.get('seconds', 60))
+		points = int(request.args.get('points', 120))
+	except ValueError as e:
+		abort(400, description=str(e))
+
+	if not seconds > 0 or points <= 0:
+		abort(400, description="seconds and points must be greater than 0")
+
+	return jsonify(brain.sensor_history(seconds, points))
+
 #
 # Wake up sense, lets main board send a wake up signal to the sense board
 # GET: /api/wakeupsense
@@ -474,6 +491,52 @@ def health_status():
 	api_response = brain.health_status()
 	return jsonify(api_response)
 
+#
+# Push channel (Server-Sent Events) of health and sensor state
+# GET: /api/events?topics=health,sensors
+#
+# Return text/event-stream, events named by topic with json data
+#
+@app.route('/api/events', methods=['GET'])
+def events():
+	topics = request.args.get('topics')
+	topics = topics.split(",") if topics else None
+
+	return Response(brain.push.stream(topics), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+#
+# Http connection pool statistics (connections opened vs reused)
+# GET: /api/http_stats
+#
+# Return json response
+#
+@app.route('/api/http_stats', methods=['GET'])
+def http_stats():
+	api_response = brain.http_stats()
+	return jsonify(api_response)
+
+#
+# Chat pipeline metrics (per stage latency of the last response) and agent runtime prompts
+# GET: /api/chat_stats
+#
+# Return json response
+#
+@app.route('/api/chat_stats', methods=['GET'])
+def chat_stats():
+	api_response = brain.chat_stats()
+	return jsonify(api_response)
+
+#
+# TTS phrase cache metrics (hits/misses)
+# GET: /api/tts_cache
+#
+# Return json response
+#
+@app.route('/api/tts_cache', methods=['GET'])
+def tts_cache():
+	api_response = brain.robot.tts_engine.cache.stats()
+	return jsonify(api_response)
+
 #
 # Robot reset
 # GET: /api/robot01_reset
@@ -551,6 +614,17 @@ def notification():
 	brain.notification(message)
 	return ""
 
+#
+# Recent robot notifications and bus statistics
+# GET: /api/notifications
+#
+# Return json response
+#
+@app.route('/api/notifications', methods=['GET'])
+def notifications():
+	api_response = { "recent" : brain.notifications.recent(), "stats" : brain.notifications.stats() }
+	return jsonify(api_response)
+
 #
 #
 #
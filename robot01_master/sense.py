@@ -4,20 +4,38 @@ import time
 import base64
 from ping3 import ping, verbose_ping
 
+from http_pool import HTTP_POOL
+from device_client import DEVICE_CLIENT
+
 # Health check interval (seconds)
 HEALTH_CHECK_INTERVAL = 5
+# Http timeouts (seconds), default and per endpoint
+HTTP_TIMEOUT = 10
+HTTP_ENDPOINT_TIMEOUTS = { "/control" : 5 }
+# Tracked camera state is re-validated after this time, the web ui can change settings on the device directly (seconds)
+CAMERA_STATE_MAX_AGE = 30
 
 class SENSE:
-	def __init__(self, ip):
+	def __init__(self, ip, client=None):
 
 		self.ip = ip
 		self.mic = False
+
+		# Keep-alive http connection pool
+		self.http = HTTP_POOL("sense", timeout=HTTP_TIMEOUT, timeouts=HTTP_ENDPOINT_TIMEOUTS)
+		# Async client for non-blocking calls (shared event loop with robot when given)
+		self.client = client if client else DEVICE_CLIENT(timeout=HTTP_TIMEOUT)
 		
 		# health
 		self.health = False
 		self.latency = 999
 		self.health_error = 0
 
+		# Tracked camera framesize (None = unknown) and time it was set/read
+		self.framesize = None
+		self.framesize_time = 0
+		self.framesize_skipped = 0
+
 		# Health worker
 		threading.Thread(target=self.health_check_worker).start()
 
@@ -31,6 +49,8 @@ class SENSE:
 					self.health_error += 1
 					if self.health_error > 2:
 						self.health = False
+						# Camera state is lost when the device restarts
+						self.framesize = None
 				else:
 					self.health_error = 0
 					self.health = True
@@ -38,6 +58,13 @@ class SENSE:
 				print(f"Sense ping error : {e}")			
 	
 			time.sleep(HEALTH_CHECK_INTERVAL)		
+
+	# Change ip of sense, connections and camera state of the old device are dropped
+	def set_ip(self, ip):
+		self.ip = ip
+		self.framesize = None
+		self.http.reset()
+		self.client.reset()
 		
 	def micstreaming(self, state = -1)->bool:
 		
@@ -55,7 +82,7 @@ class SENSE:
 		else:
 	
 			self.mic = True if state == 1 else False
-			threading.Thread(target=self.sense_http_call, args=["/control?setting=micstreaming&param=" + str(state)]).start()
+			self.sense_http_send("/control?setting=micstreaming&param=" + str(state))
 
 		return self.mic
 							
@@ -72,7 +99,7 @@ class SENSE:
 				return False
 			
 		else:
-			threading.Thread(target=self.sense_http_call, args=["/control?setting=camstreaming&param=" + str(state)]).start()
+			self.sense_http_send("/control?setting=camstreaming&param=" + str(state))
 		
 		if state == 1:
 			return True
@@ -90,57 +117,95 @@ class SENSE:
 			except Exception as e:
 				print("Request - micgain error : ",e)
 		else:
-			threading.Thread(target=self.sense_http_call, args=[('/control?setting=micgain&param=' + str(set_micgain) )]).start()
+			self.sense_http_send('/control?setting=micgain&param=' + str(set_micgain))
 
 		return set_micgain
 
-	def capture(self, resolution=8)->str:
-	
-		image_base64 = ""
-		try: 
-			# Set resolution
-			self.sense_http_call('/control?setting=framesize&param=' + str(resolution))
-		except:
-			print("Setting request resolution failed")
+	#
+	# Capture image, returns raw JPEG bytes (b"" on failure)
+	#
+	def capture_jpeg(self, resolution=8)->bytes:
+		self.set_framesize(resolution)
 			
 		# Get image
 		response  = self.sense_http_call('/capture')
 		try:
-			image_base64 = base64.b64encode(response.content)
+			return response.content
 		except Exception as e:
 			print("Capture request failed", e)
 				
-		return image_base64
+		return b""
+
+	#
+	# Capture image, returns base64 encoded JPEG ("" on failure). Encoding is for callers that need text
+	#
+	def capture(self, resolution=8)->str:
+		jpeg = self.capture_jpeg(resolution)
+		return base64.b64encode(jpeg).decode("ascii") if jpeg else ""
+
+	#
+	# Set camera framesize before capture, skipped when the camera already has it
+	#
+	def set_framesize(self, resolution):
+		try:
+			resolution = int(resolution)
+		except (TypeError, ValueError):
+			return
+
+		if resolution == self.framesize and time.monotonic() - self.framesize_time < CAMERA_STATE_MAX_AGE:
+			self.framesize_skipped += 1
+			return
+
+		response = self.sense_http_call('/control?setting=framesize&param=' + str(resolution))
+		if response != "" and response.ok:
+			self.framesize = resolution
+			self.framesize_time = time.monotonic()
+		else:
+			self.framesize = None
+			print("Setting request resolution failed")
 
 	def cam_resolution(self, res=-1)->int:
 		if res == -1:			
 			response = self.sense_http_call('/control?setting=framesize&param=-1')
 			try:
 				json_obj = response.json()
+				self.framesize = int(json_obj['framesize'])
+				self.framesize_time = time.monotonic()
 				return json_obj['framesize']					
 			except Exception as e:
 				print("Request - cam_resolution error : ",e)
 		else:		
-			threading.Thread(target=self.sense_http_call, args=[('/control?setting=framesize&param=' + str(res))]).start()
+			sent = self.sense_http_send('/control?setting=framesize&param=' + str(res))
+			try:
+				self.framesize = int(res) if sent else None
+			except ValueError:
+				self.framesize = None
+			self.framesize_time = time.monotonic()
 
 		return res
 	
 	def go2sleep(self):
-		threading.Thread(target=self.sense_http_call, args=[('/go2sleep')]).start()
+		self.sense_http_send('/go2sleep')
 		print("Sense go2sleep send")
 	
 	def reset(self):
-		threading.Thread(target=self.sense_http_call, args=[('/reset')]).start()
+		self.sense_http_send('/reset')
 		print("Sense reset send")
 	
 	def erase_config(self):
-		threading.Thread(target=self.sense_http_call, args=[('/eraseconfig')]).start()
+		self.sense_http_send('/eraseconfig')
 		print("Sense erase config send")
 
+	def sense_http_send(self,url) -> any:
+		if self.health:
+			url = 'http://' + self.ip + url
+			return self.client.submit(url, self.http.endpoint_timeout(url))
+		return
+
 	def sense_http_call(self,url) -> any:
 		if self.health:
 			try:
-				response = requests.get('http://' + self.ip + url, timeout=10)
+				response = self.http.get('http://' + self.ip + url)
 				return response
 			except Exception as e:
 				print("Request - " + url + " , error : ",e)
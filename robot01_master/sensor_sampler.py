@@ -0,0 +1,192 @@
+import time
+import threading
+import numpy as np
+
+# Default sample rate (Hz) and allowed range
+SENSOR_RATE = 5
+MIN_SENSOR_RATE = 0.1
+MAX_SENSOR_RATE = 20
+# Sampling pauses when no reader asked for readings or history within this time (seconds)
+SENSOR_IDLE_TIMEOUT = 30
+# Ring buffer length (samples), 10 minutes at 5 Hz
+SENSOR_HISTORY = 3000
+# Columns of the ring buffer
+SENSOR_COLUMNS = ["time", "yaw", "pitch", "roll", "distance"]
+
+# Class SENSOR_SAMPLER : background sampler of the robot sensors
+# fetch() returns (motion sensor dict, distance sensor dict), either can be None when not available.
+# Readings are kept in a fixed-size numpy ring buffer of timestamped yaw, pitch, roll and distance (mm),
+# latest full readings are kept for bounded-staleness reads (see latest()).
+# The sampler only polls the robot while it has readers : every read marks demand, after SENSOR_IDLE_TIMEOUT
+# without reads sampling pauses until the next read.
+class SENSOR_SAMPLER:
+	def __init__(self, fetch, rate=SENSOR_RATE, size=SENSOR_HISTORY, idle_timeout=SENSOR_IDLE_TIMEOUT):
+		self.fetch = fetch
+		self.rate = self.valid_rate(rate)
+		self.idle_timeout = idle_timeout
+
+		# Time of last read, a read resumes a paused sampler
+		self.last_demand = 0
+		self.demand = threading.Event()
+
+		self.lock = threading.Lock()
+		self.buffer = np.full((size, len(SENSOR_COLUMNS)), np.nan)
+		self.index = 0
+		self.count = 0
+
+		# Latest full readings and their time
+		self.motion = None
+		self.distance = None
+		self.motion_time = 0
+		self.distance_time = 0
+
+		self.samples = 0
+		self.errors = 0
+		self.running = False
+
+	#
+	# Sample rate within MIN_SENSOR_RATE..MAX_SENSOR_RATE, default rate when not a positive number
+	#
+	@staticmethod
+	def valid_rate(rate)->float:
+		try:
+			rate = float(rate)
+		except (TypeError, ValueError):
+			rate = 0
+		if not rate > 0:
+			print("Sensor sampler : invalid rate " + str(rate) + ", using " + str(SENSOR_RATE) + " Hz")
+			return SENSOR_RATE
+		return min(max(rate, MIN_SENSOR_RATE), MAX_SENSOR_RATE)
+
+	#
+	# Mark demand for readings, resumes a paused sampler
+	#
+	def touch(self):
+		self.last_demand = time.monotonic()
+		self.demand.set()
+
+	def active(self)->bool:
+		return time.monotonic() - self.last_demand < self.idle_timeout
+
+	#
+	# Start sampler worker
+	#
+	def start(self):
+		if not self.running:
+			self.running = True
+			threading.Thread(target=self.sampler, daemon=True).start()
+
+	def stop(self):
+		self.running = False
+		self.demand.set()
+
+	#
+	# Sampler worker
+	#
+	def sampler(self):
+		print("Sensor sampler started.")
+		while self.running:
+			# No readers, pause until the next read
+			if not self.active():
+				self.demand.clear()
+				if not self.active():
+					self.demand.wait()
+				continue
+
+			start = time.monotonic()
+			try:
+				motion, distance = self.fetch()
+				self.add(motion, distance)
+			except Exception as e:
+				self.errors += 1
+				print("Sensor sampler : ", e)
+
+			time.sleep(max(1 / self.rate - (time.monotonic() - start), 0))
+
+		print("Sensor sampler stopped.")
+
+	#
+	# Add readings to the ring buffer
+	#
+	def add(self, motion, distance, now=None):
+		if motion is None and distance is None:
+			return
+		if now is None:
+			now = time.time()
+
+		row = [now, np.nan, np.nan, np.nan, np.nan]
+		if motion:
+			row[1:4] = [motion.get("yaw", np.nan), motion.get("pitch", np.nan), motion.get("roll", np.nan)]
+		if distance:
+			row[4] = distance.get("range_mm", np.nan)
+
+		with self.lock:
+			if motion:
+				self.motion, self.motion_time = motion, now
+			if distance:
+				self.distance, self.distance_time = distance, now
+
+			self.buffer[self.index] = row
+			self.index = (self.index + 1) % self.buffer.shape[0]
+			self.count = min(self.count + 1, self.buffer.shape[0])
+			self.samples += 1
+
+	#
+	# Latest full reading ("motion" or "distance") when not older than max_age seconds, else None
+	#
+	def latest(self, sensor, max_age)-> any:
+		self.touch()
+		with self.lock:
+			if sensor == "motion":
+				reading, reading_time = self.motion, self.motion_time
+			else:
+				reading, reading_time = self.distance, self.distance_time
+
+		if reading is None or time.time() - reading_time > max_age:
+			return None
+		return reading
+
+	#
+	# Samples of the last seconds, oldest first (rows of SENSOR_COLUMNS)
+	#
+	def window(self, seconds)->np.ndarray:
+		self.touch()
+		with self.lock:
+			if self.count < self.buffer.shape[0]:
+				rows = self.buffer[:self.count].copy()
+			else:
+				rows = np.roll(self.buffer, -self.index, axis=0)
+
+		return rows[rows[:, 0] >= time.time() - seconds]
+
+	#
+	# Samples of the last seconds averaged into at most points buckets of equal duration
+	# Empty buckets are left out, nan readings are ignored.
+	#
+	def downsampled(self, seconds, points)->np.ndarray:
+		rows = self.window(seconds)
+		if rows.shape[0] <= points:
+			return rows
+
+		start = time.time() - seconds
+		buckets = np.minimum(((rows[:, 0] - start) / seconds * points).astype(int), points - 1)
+
+		result = []
+		for bucket in np.unique(buckets):
+			selected = rows[buckets == bucket]
+			valid = ~np.isnan(selected)
+			sums = np.where(valid, selected, 0).sum(axis=0)
+			counts = valid.sum(axis=0)
+			result.append(np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0))
+
+		return np.array(result)
+
+	#
+	# Rows as list of dicts (nan -> None), for json
+	#
+	@staticmethod
+	def to_list(rows)->list:
+		return [{column : (None if np.isnan(value) else round(float(value), 3)) for column, value in zip(SENSOR_COLUMNS, row)} for row in rows]
+
+	def stats(self)->dict:
+		return { "rate" : self.rate, "samples" : self.samples, "errors" : self.errors, "buffered" : self.count, "running" : self.running, "active" : self.active() }
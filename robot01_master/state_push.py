@@ -0,0 +1,111 @@
+import json
+import time
+import queue
+import threading
+
+# Max pending events per client, oldest are dropped for slow clients
+CLIENT_Q_SIZE = 16
+# Keep-alive comment sent to idle clients (seconds)
+KEEPALIVE_INTERVAL = 15
+# Sampler resolution (seconds)
+SAMPLER_TICK = 0.1
+
+# Class PUSH_CLIENT : event queue of one connected client (browser)
+class PUSH_CLIENT:
+	def __init__(self, topics):
+		self.topics = topics
+		self.q = queue.Queue(maxsize=CLIENT_Q_SIZE)
+
+	def put(self, event):
+		try:
+			self.q.put_nowait(event)
+		except queue.Full:
+			try:
+				self.q.get_nowait()
+			except queue.Empty:
+				pass
+			self.q.put_nowait(event)
+
+# Class STATE_PUSH : single server-side sampler fanning out state to all connected clients
+# Topics are sampled by one thread at their own interval, only while at least one client listens to them,
+# so device load does not depend on the number of browsers open.
+# stream() yields Server-Sent Events (text/event-stream)
+class STATE_PUSH:
+	def __init__(self):
+		self.lock = threading.Lock()
+		# name -> {"sample" : callable, "interval" : seconds, "next" : monotonic time, "latest" : last value}
+		self.topics = {}
+		self.clients = []
+		self.samples = 0
+
+		threading.Thread(target=self.sampler, daemon=True).start()
+
+	#
+	# Register topic, sample() is called every interval seconds and must return a json serializable value
+	#
+	def topic(self, name, sample, interval):
+		with self.lock:
+			self.topics[name] = {"sample" : sample, "interval" : interval, "next" : 0, "latest" : None}
+
+	#
+	# Sampler worker
+	#
+	def sampler(self):
+		print("State push sampler started.")
+		while True:
+			now = time.monotonic()
+			with self.lock:
+				due = [(name, topic) for name, topic in self.topics.items() if topic["next"] <= now and any(name in client.topics for client in self.clients)]
+				for name, topic in due:
+					topic["next"] = now + topic["interval"]
+
+			for name, topic in due:
+				try:
+					topic["latest"] = topic["sample"]()
+					self.samples += 1
+				except Exception as e:
+					print("State push sample " + name + " : ", e)
+					continue
+				self.publish(name, topic["latest"])
+
+			time.sleep(SAMPLER_TICK)
+
+	#
+	# Fan out event to clients listening to the topic
+	#
+	def publish(self, name, data):
+		event = "event: " + name + "\ndata: " + json.dumps(data) + "\n\n"
+		with self.lock:
+			clients = [client for client in self.clients if name in client.topics]
+		for client in clients:
+			client.put(event)
+
+	#
+	# Event stream of topics for one client, latest known values are sent first
+	#
+	def stream(self, topics=None):
+		with self.lock:
+			topics = [name for name in (topics or self.topics) if name in self.topics]
+			client = PUSH_CLIENT(topics)
+			self.clients.append(client)
+			latest = [(name, self.topics[name]["latest"]) for name in topics if self.topics[name]["latest"] is not None]
+
+		try:
+			# Let browser reconnect after 3 seconds when the connection drops
+			yield "retry: 3000\n\n"
+			for name, data in latest:
+				yield "event: " + name + "\ndata: " + json.dumps(data) + "\n\n"
+
+			while True:
+				try:
+					yield client.q.get(timeout=KEEPALIVE_INTERVAL)
+				except queue.Empty:
+					yield ": keep-alive\n\n"
+		finally:
+			# Client disconnected
+			with self.lock:
+				self.clients.remove(client)
+
+	def stats(self)->dict:
+		with self.lock:
+			return { "clients" : len(self.clients), "samples" : self.samples, "topics" : {name : topic["interval"] for name, topic in self.topics.items()} }
@@ -5,27 +5,72 @@ import socket
 import threading
 import time
 import queue
-import torch
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-torch.set_default_device(device)
-torch_dtype = torch.float16
-model_id = "distil-whisper/distil-large-v3"
+from stt_engines import create_stt_engine, DEFAULT_STT_ENGINE
 
 UDP_IP = "0.0.0.0" 
 UDP_PORT = 3000 # Audio stream receive udp port
-sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
-sock.bind((UDP_IP, UDP_PORT))
+
+# Receive buffer : datagrams are 1024 bytes (256 float32 samples), VAD runs on 512 sample windows
+DATAGRAM_BYTES = 1024
+VAD_WINDOW = 512
+# Max samples drained from the socket per wake-up
+RECEIVE_BUFFER_SAMPLES = 16384
+# Backoff after a socket error, doubled per consecutive error (seconds)
+RECEIVE_ERROR_BACKOFF = 0.05
+MAX_RECEIVE_ERROR_BACKOFF = 1
 
 # VAD PARAMETERS
 MAX_SILENCE_PERIOD = 100
 VAD_SENSITIVITY = 0.09
 MIN_SPEECH_LENGTH = 41000
+# Max utterance length (samples, 30 seconds = whisper window). Longer speech is flushed to the transcriber in parts
+MAX_SPEECH_LENGTH = 480000
+# Initial speech buffer size (samples), grows up to MAX_SPEECH_LENGTH
+SPEECH_BUFFER_SAMPLES = 80000
+
+# Partial transcription while speaking, every PARTIAL_INTERVAL samples of speech and at silence onset
+PARTIAL_TRANSCRIPTION = True
+PARTIAL_INTERVAL = 16000
 
 # QUEUE size
 AUDIOCHUNKS_Q_SIZE = 2
 
+# Speech buffer : preallocated float32 buffer with amortized growth up to a max length
+class SPEECH_BUFFER:
+	def __init__(self, max_samples=MAX_SPEECH_LENGTH, samples=SPEECH_BUFFER_SAMPLES):
+		self.max_samples = max_samples
+		self.buffer = np.empty(min(samples, max_samples), dtype=np.float32)
+		self.size = 0
+
+	# Append samples, grows buffer (doubling) when needed
+	def append(self, data):
+		needed = self.size + data.shape[0]
+		if needed > self.buffer.shape[0]:
+			grown = np.empty(max(min(self.buffer.shape[0] * 2, self.max_samples), needed), dtype=np.float32)
+			grown[:self.size] = self.buffer[:self.size]
+			self.buffer = grown
+
+		self.buffer[self.size:needed] = data
+		self.size = needed
+
+	# Copy of buffered speech, buffer is kept
+	def snapshot(self)->np.ndarray:
+		return self.buffer[:self.size].copy()
+
+	# Appending samples would exceed max length
+	def full(self, samples=0)->bool:
+		return self.size + samples > self.max_samples
+
+	# Returns copy of buffered speech and empties the buffer
+	def take(self)->np.ndarray:
+		speech = self.buffer[:self.size].copy()
+		self.size = 0
+		return speech
+
+	def clear(self):
+		self.size = 0
+
 # STT Class with VAD
 class STT:
 	def __init__(self, brain):
@@ -39,72 +84,116 @@ class STT:
 		self.vad_sensitivity = VAD_SENSITIVITY
 		self.max_silence_period = MAX_SILENCE_PERIOD
 		self.min_speech_length = MIN_SPEECH_LENGTH
+		self.max_speech_length = MAX_SPEECH_LENGTH
 		
 		self.audiochunks_q = queue.Queue(maxsize=AUDIOCHUNKS_Q_SIZE)
+
+		# STT engine from config
+		self.engine = create_stt_engine(brain.config.get("stt_engine", DEFAULT_STT_ENGINE))
+
+		# Partial transcription state
+		self.partial = PARTIAL_TRANSCRIPTION
+		self.partial_interval = PARTIAL_INTERVAL
+		self.transcribing = False
+		self.utterance = 0
+		self.partial_utterance = -1
+		self.partial_samples = 0
+		self.partial_text = []
+
+		# UDP audio socket, opened on start
+		self.sock = None
+		self.load_lock = threading.Lock()
 		
 	# Model loading is deferred so class can be loaded without loading model, speeding up startup of the server
+	# torch is imported on load. Safe to call from a warm-up thread and start() at the same time
 	def loadmodels(self):
-		if not self.loaded:
-			print("Loading STT models")
-			
-			# Forcing the whole VAD model to CPU as ONNX and input are mixed
-			self.vad_model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad", force_reload=False, onnx=True)
-			
-			self.stt_model = AutoModelForSpeechSeq2Seq.from_pretrained(model_id, torch_dtype=torch_dtype, low_cpu_mem_usage=True, use_safetensors=True).to(device)
-			self.stt_model.to(device)
-			self.processor = AutoProcessor.from_pretrained(model_id)
-	
-			self.transcriber = pipeline(
-				"automatic-speech-recognition",
-				device=device,
-				model=self.stt_model,
-				tokenizer=self.processor.tokenizer,
-				feature_extractor=self.processor.feature_extractor,
-				max_new_tokens=128,
-				torch_dtype=torch_dtype
-			)
-
-		print("STT Models loaded")
-		self.loaded = True
+		with self.load_lock:
+			if not self.loaded:
+				print("Loading STT models")
+				import torch
+				self.torch = torch
+				
+				# Forcing the whole VAD model to CPU as ONNX and input are mixed
+				self.vad_model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad", force_reload=False, onnx=True)
+				
+				self.engine.load()
+				print("STT engine : " + self.engine.name)
+
+				print("STT Models loaded")
+				self.loaded = True
+
+	# Open UDP audio receive socket (once)
+	def open_socket(self):
+		if self.sock is None:
+			self.sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+			self.sock.bind((UDP_IP, UDP_PORT))
 			
+	# Receive VAD windows from the UDP socket
+	# Blocks for one datagram, then drains all queued datagrams without blocking into a preallocated buffer.
+	# Yields contiguous views (VAD_WINDOW samples) on the buffer, valid until the next window is requested
+	def receive_windows(self):
+		buffer = np.empty(RECEIVE_BUFFER_SAMPLES + VAD_WINDOW, dtype=np.float32)
+		buffer_bytes = buffer.view(np.uint8)
+		view = memoryview(buffer_bytes)
+		filled = 0
+		backoff = RECEIVE_ERROR_BACKOFF
+
+		while self.running:
+			flags = 0
+			while filled + DATAGRAM_BYTES <= len(view):
+				try:
+					filled += self.sock.recv_into(view[filled:], DATAGRAM_BYTES, flags)
+					backoff = RECEIVE_ERROR_BACKOFF
+				except BlockingIOError:
+					break
+				except Exception as e:
+					# Persistent errors return immediately, back off instead of spinning
+					print("UDP audio receive error : ",type(e).__name__ )
+					time.sleep(backoff)
+					backoff = min(backoff * 2, MAX_RECEIVE_ERROR_BACKOFF)
+					break
+				flags = socket.MSG_DONTWAIT
+
+			windows = filled // (VAD_WINDOW * 4)
+			for n in range(windows):
+				yield buffer[n * VAD_WINDOW:(n + 1) * VAD_WINDOW]
+
+			# Keep partial window for next receive
+			used = windows * VAD_WINDOW * 4
+			buffer_bytes[:filled - used] = buffer_bytes[used:filled]
+			filled = filled - used
+
+	# VAD speech probability of window
+	def speech_probability(self, window)->float:
+		return self.vad_model(self.torch.from_numpy(window), 16000).item()
+
 	# async audio receiver
 	def receive_audio(self):
 		
-		np_audio_chunk = np.empty(0)
+		speech = SPEECH_BUFFER(self.max_speech_length)
 		nonsilence_counter = 0 # Counter for silence period
 		speech_detected = False
+		speech_end = 0 # Samples up to last window with speech
+		partial_at = 0 # Speech buffer size at last partial transcription
 		
 		self.vad_model.reset_states() 
+		windows = self.receive_windows()
 	
-		# 25 samples to establish baseline	
-		for i in range(25):
-			data1, addr = sock.recvfrom(1024)  # Buffer size is 1024 bytes
-			data2, addr = sock.recvfrom(1024)  # Buffer size is 1024 bytes
-			raw_data = data1 + data2
-			np_data = np.frombuffer(raw_data, dtype=np.float32)
-			speech_probability = self.vad_model(torch.tensor(np_data).cpu(), 16000).cpu().item()
+		# 25 windows to establish baseline	
+		for i, np_data in zip(range(25), windows):
+			speech_probability = self.speech_probability(np_data)
 
 		print("Ready to listen...")		
 		
-		while self.running:
+		for np_data in windows:
 			speech_probability = 0
 			try:
-				# Receive data from the socket (with a buffer size of 1024 bytes)
-				# Need a 2048 Sample for VAD so will add two together, as audio packets are 1024 size
-				data1, addr = sock.recvfrom(1024)  # Buffer size is 1024 bytes
-				data2, addr = sock.recvfrom(1024)  # Buffer size is 1024 bytes
-				raw_data = data1 + data2
-				
-				np_data = np.frombuffer(raw_data, dtype=np.float32)
-				
-				# VAD
-				speech_probability = self.vad_model(torch.tensor(np_data).cpu(), 16000).cpu().item()
-				print(speech_probability)
-				
+				speech_probability = self.speech_probability(np_data)
 			except Exception as e:
-				print("UDP audio receive & analysis error : ",type(e).__name__ )
+				print("Audio VAD analysis error : ",type(e).__name__ )
 
-			if speech_probability > self.vad_sensitivity:
+			is_speech = speech_probability > self.vad_sensitivity
+			if is_speech:
 				nonsilence_counter = self.max_silence_period
 				if not speech_detected:
 					speech_detected = True
@@ -112,61 +201,110 @@ class STT:
 					#Send robot.display action
 					self.brain.robot.display.state(19)
 
-			# Create Audio transcription sample until silence is detected via nonsilence_counter. 
-			# Currently no max sample size. 
+			# Create Audio transcription sample until silence is detected via nonsilence_counter,
+			# or until max speech length is reached.
 			if nonsilence_counter > 0:	
 			
 				nonsilence_counter = nonsilence_counter - 1
-				np_audio_chunk = np.concatenate([np_audio_chunk,np_data])
+
+				# Max speech length reached, flush to transcriber and keep listening
+				if speech.full(np_data.shape[0]):
+					print("STT Max speech length reached")
+					self.queue_speech(speech.take(), True, speech_end)
+					speech_end = 0
+					partial_at = 0
+
+				speech.append(np_data)
+				if is_speech:
+					speech_end = speech.size
+
+				# Partial transcription : at regular intervals and at silence onset
+				if self.partial and speech.size > self.min_speech_length:
+					if speech.size - partial_at >= self.partial_interval or (not is_speech and speech_end > partial_at):
+						if self.queue_speech(speech.snapshot(), False, speech_end):
+							partial_at = speech.size
 				
 				# Silende detected
 				if nonsilence_counter <= 0:
-					if np_audio_chunk.size > self.min_speech_length:		
-						try:
-							self.audiochunks_q.put_nowait(np_audio_chunk)
-						except Exception as e:
-							print("Audiochunk queue error : " ,e)
+					if speech.size > self.min_speech_length:		
+						self.queue_speech(speech.take(), True, speech_end)
 
 					print("STT Detection ended")
 					speech_detected = False
 					nonsilence_counter = 0
+					speech_end = 0
+					partial_at = 0
 					self.vad_model.reset_states() 
 
 					#Send robot.display action 
 					self.brain.robot.display.state(3)
-					np_audio_chunk = np.empty(0)
+					speech.clear()
 					
+	# Queue speech for transcription. Partials are only queued when the transcriber is idle
+	# speech_end : samples of audio_chunk up to the last speech window
+	def queue_speech(self, audio_chunk, final, speech_end)->bool:
+		if not final and (self.transcribing or not self.audiochunks_q.empty()):
+			return False
+
+		try:
+			self.audiochunks_q.put_nowait({"audio" : audio_chunk, "final" : final, "utterance" : self.utterance, "speech_end" : speech_end})
+		except Exception as e:
+			print("Audiochunk queue error : " ,e)
+			return False
+
+		if final:
+			self.utterance += 1
+
+		return True
+
+	# Transcribe audio with the STT engine, returns list of text
+	def run_transcription(self, audio_chunk)->list:
+		return self.engine.transcribe(audio_chunk)
+
 	# async function to do audio transcription
+	# Partials are passed to brain.partial_transcription, finals to brain.stt_q.
+	# A final reuses the partial of the same utterance when that partial already covered all speech
 	def transcribe(self):
 		print("Ready to transcribe...")
 		while self.running:
 			transcription = ""
-			audio_chunk = self.audiochunks_q.get()
-			self.brain.robot.display.state(20)
+			job = self.audiochunks_q.get()
+			self.transcribing = True
 
-			input_features = self.processor(audio_chunk, sampling_rate=16000, return_tensors="pt", device="cuda").input_features
-			input_features = input_features.to(device, dtype=torch_dtype)
-			
-			gen_kwargs = {"max_new_tokens": 128,"num_beams": 1,"return_timestamps": False}
-			
-			pred_ids = self.stt_model.generate(input_features, **gen_kwargs)
-			transcription = self.processor.batch_decode(pred_ids, skip_special_tokens=True, decode_with_timestamps=gen_kwargs["return_timestamps"])
+			if not job['final']:
+				transcription = self.run_transcription(job['audio'])
+				self.partial_utterance = job['utterance']
+				self.partial_samples = job['audio'].shape[0]
+				self.partial_text = transcription
+				print("Partial : ", transcription)
+				self.brain.partial_transcription(transcription)
 
-			print(transcription)
+			else:
+				self.brain.robot.display.state(20)
 
-			try:
-				self.brain.stt_q.put_nowait(transcription)
-			except Exception as e:
-				print("Transcribe error : ",e)
+				if job['utterance'] == self.partial_utterance and self.partial_samples >= job['speech_end']:
+					transcription = self.partial_text
+				else:
+					transcription = self.run_transcription(job['audio'])
+
+				print(transcription)
+
+				try:
+					self.brain.stt_q.put_nowait(transcription)
+				except Exception as e:
+					print("Transcribe error : ",e)
+
+				self.brain.robot.display.state(3)
 
+			self.transcribing = False
 			self.audiochunks_q.task_done()
-			self.brain.robot.display.state(3)
 
 	def start(self):
 		if not self.running:
 			self.running = True
 			if not self.loaded:
 				self.loadmodels()
+			self.open_socket()
 
 			threading.Thread(target=self.receive_audio, daemon=True).start()
 			threading.Thread(target=self.transcribe, daemon=True).start()
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Default STT engine (config : "stt_engine")
+DEFAULT_STT_ENGINE = "whisper_hf"
+
+MODEL_ID = "distil-whisper/distil-large-v3"
+# CTranslate2 conversion of distil-large-v3 (faster-whisper)
+CT2_MODEL_ID = "distil-large-v3"
+
+MAX_NEW_TOKENS = 128
+SAMPLE_RATE = 16000
+
+# STT engine interface
+# load() : load model(s), transcribe(audio) : 16khz mono float32 -> list of text
+class STT_ENGINE:
+	name = ""
+
+	def load(self):
+		raise NotImplementedError
+
+	def transcribe(self, audio)->list:
+		raise NotImplementedError
+
+# Transformers distil-whisper. float16 on cuda, float32 on cpu
+class WHISPER_HF_ENGINE(STT_ENGINE):
+	name = "whisper_hf"
+
+	def load(self):
+		import torch
+		from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+
+		self.torch = torch
+		self.device = "cuda" if torch.cuda.is_available() else "cpu"
+		self.torch_dtype = torch.float16 if self.device == "cuda" else torch.float32
+
+		self.model = AutoModelForSpeechSeq2Seq.from_pretrained(MODEL_ID, torch_dtype=self.torch_dtype, low_cpu_mem_usage=True, use_safetensors=True).to(self.device)
+		self.processor = AutoProcessor.from_pretrained(MODEL_ID)
+
+	def transcribe(self, audio)->list:
+		input_features = self.processor(audio, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features
+		input_features = input_features.to(self.device, dtype=self.torch_dtype)
+
+		gen_kwargs = {"max_new_tokens": MAX_NEW_TOKENS,"num_beams": 1,"return_timestamps": False}
+
+		with self.torch.inference_mode():
+			pred_ids = self.model.generate(input_features, **gen_kwargs)
+		return self.processor.batch_decode(pred_ids, skip_special_tokens=True, decode_with_timestamps=gen_kwargs["return_timestamps"])
+
+# Transformers distil-whisper on cpu with dynamic int8 quantization of the linear layers
+class WHISPER_INT8_ENGINE(WHISPER_HF_ENGINE):
+	name = "whisper_int8"
+
+	def load(self):
+		import torch
+		from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+
+		self.torch = torch
+		self.device = "cpu"
+		self.torch_dtype = torch.float32
+
+		model = AutoModelForSpeechSeq2Seq.from_pretrained(MODEL_ID, torch_dtype=self.torch_dtype, low_cpu_mem_usage=True, use_safetensors=True)
+		self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+		self.processor = AutoProcessor.from_pretrained(MODEL_ID)
+
+# CTranslate2 runtime via faster-whisper (int8 on cpu, float16 on cuda)
+class WHISPER_CT2_ENGINE(STT_ENGINE):
+	name = "whisper_ct2"
+
+	def load(self):
+		import torch
+		from faster_whisper import WhisperModel
+
+		if torch.cuda.is_available():
+			self.model = WhisperModel(CT2_MODEL_ID, device="cuda", compute_type="float16")
+		else:
+			self.model = WhisperModel(CT2_MODEL_ID, device="cpu", compute_type="int8")
+
+	def transcribe(self, audio)->list:
+		segments, info = self.model.transcribe(np.asarray(audio, dtype=np.float32), beam_size=1, language="en", condition_on_previous_text=False)
+		return [" ".join(segment.text.strip() for segment in segments)]
+
+STT_ENGINES = {
+	WHISPER_HF_ENGINE.name : WHISPER_HF_ENGINE,
+	WHISPER_INT8_ENGINE.name : WHISPER_INT8_ENGINE,
+	WHISPER_CT2_ENGINE.name : WHISPER_CT2_ENGINE,
+}
+
+# Create engine by name, unknown names fall back to the default engine
+def create_stt_engine(name)->STT_ENGINE:
+	if name not in STT_ENGINES:
+		if name:
+			print("STT engine " + name + " not found, using " + DEFAULT_STT_ENGINE)
+		name = DEFAULT_STT_ENGINE
+
+	return STT_ENGINES[name]()
@@ -0,0 +1,179 @@
+import os
+import re
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Cache directory for synthesized phrases (.npy, 16khz mono f32le)
+CACHE_DIR = "audio/tts_cache"
+# Max phrases in memory (LRU)
+MEMORY_MAX_ENTRIES = 128
+# Max phrases on disk, least recently used files are removed
+DISK_MAX_ENTRIES = 2000
+# Only cache phrases up to this length, long LLM sentences rarely repeat
+MAX_TEXT_LENGTH = 120
+
+# Class TTS_CACHE : content addressed phrase cache for synthesized speech
+# Key is normalized text + voice id. Two tiers :
+#	memory : LRU of audio arrays
+#	disk : .npy files under CACHE_DIR, loaded memory-mapped
+#
+class TTS_CACHE:
+	def __init__(self, cache_dir=CACHE_DIR, memory_max_entries=MEMORY_MAX_ENTRIES, disk_max_entries=DISK_MAX_ENTRIES):
+		self.cache_dir = cache_dir
+		self.memory_max_entries = memory_max_entries
+		self.disk_max_entries = disk_max_entries
+
+		self.memory = OrderedDict()
+		self.lock = threading.Lock()
+
+		# Metrics
+		self.memory_hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+
+		try:
+			os.makedirs(self.cache_dir, exist_ok=True)
+			self.disk_entries = len(glob.glob(os.path.join(self.cache_dir, "*.npy")))
+		except Exception as e:
+			print("TTS cache directory error : ", e)
+			self.disk_entries = 0
+
+	#
+	# Normalize text : case and whitespace do not change the phrase,
+	# punctuation does ("Ready?" and "Ready." are spoken with different prosody)
+	#
+	def normalize(self, text)->str:
+		return re.sub(r"\s+", " ", text.lower()).strip()
+
+	#
+	# Content address of phrase
+	#
+	def key(self, text, voice)->str:
+		return hashlib.sha1((str(voice) + "|" + self.normalize(text)).encode("utf-8")).hexdigest()
+
+	#
+	# Phrase can be cached
+	#
+	def cacheable(self, text)->bool:
+		normalized = self.normalize(text)
+		return normalized != "" and len(normalized) <= MAX_TEXT_LENGTH
+
+	#
+	# Get audio of phrase, returns None on miss
+	#
+	def get(self, text, voice)-> any:
+		if not self.cacheable(text):
+			return None
+
+		key = self.key(text, voice)
+		with self.lock:
+			if key in self.memory:
+				self.memory.move_to_end(key)
+				self.memory_hits += 1
+				return self.memory[key]
+
+		path = os.path.join(self.cache_dir, key + ".npy")
+		try:
+			audio = np.load(path, mmap_mode="r")
+			os.utime(path) # Mark as recently used for disk eviction
+		except FileNotFoundError:
+			with self.lock:
+				self.misses += 1
+			return None
+		except Exception as e:
+			print("TTS cache read error : ", e)
+			with self.lock:
+				self.misses += 1
+			return None
+
+		with self.lock:
+			self.disk_hits += 1
+			self.remember(key, audio)
+
+		return audio
+
+	#
+	# Store audio of phrase in memory and on disk
+	#
+	def put(self, text, voice, audio):
+		if not self.cacheable(text):
+			return
+
+		key = self.key(text, voice)
+		audio = np.asarray(audio, dtype=np.float32)
+
+		with self.lock:
+			self.remember(key, audio)
+
+		path = os.path.join(self.cache_dir, key + ".npy")
+		if os.path.exists(path):
+			return
+
+		try:
+			# Write to temp file first, readers never see partial files
+			tmp_path = path + ".tmp"
+			with open(tmp_path, "wb") as f:
+				np.save(f, audio)
+			os.replace(tmp_path, path)
+			self.disk_entries += 1
+		except Exception as e:
+			print("TTS cache write error : ", e)
+			return
+
+		if self.disk_entries > self.disk_max_entries:
+			self.prune_disk()
+
+	#
+	# Add to memory tier, evict least recently used (lock must be held)
+	#
+	def remember(self, key, audio):
+		self.memory[key] = audio
+		self.memory.move_to_end(key)
+		while len(self.memory) > self.memory_max_entries:
+			self.memory.popitem(last=False)
+
+	#
+	# Remove least recently used files from disk tier
+	#
+	def prune_disk(self):
+		try:
+			files = sorted(glob.glob(os.path.join(self.cache_dir, "*.npy")), key=os.path.getmtime)
+			for path in files[:max(len(files) - self.disk_max_entries, 0)]:
+				os.remove(path)
+			self.disk_entries = min(len(files), self.disk_max_entries)
+		except Exception as e:
+			print("TTS cache prune error : ", e)
+
+	#
+	# Clear both tiers
+	#
+	def clear(self):
+		with self.lock:
+			self.memory.clear()
+		for path in glob.glob(os.path.join(self.cache_dir, "*.npy")):
+			try:
+				os.remove(path)
+			except Exception as e:
+				print("TTS cache clear error : ", e)
+		self.disk_entries = 0
+
+	#
+	# Cache metrics
+	#
+	def stats(self)->dict:
+		with self.lock:
+			hits = self.memory_hits + self.disk_hits
+			lookups = hits + self.misses
+			status = {
+				"memory_hits" : self.memory_hits,
+				"disk_hits" : self.disk_hits,
+				"misses" : self.misses,
+				"hit_rate" : round(hits / lookups, 3) if lookups else 0,
+				"memory_entries" : len(self.memory),
+				"disk_entries" : self.disk_entries,
+			}
+
+		return status
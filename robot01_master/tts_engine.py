@@ -2,26 +2,45 @@ import numpy as np
 import time
 import threading
 import queue
-from tts_speecht5 import ROBOT_TTS_MODEL
+from tts_speecht5 import ROBOT_TTS_MODEL, voice
+from tts_cache import TTS_CACHE
 
 # queue sizes
 TEXT_Q_SIZE = 15
+# Streaming synthesis, send audio per sub-sentence block
+STREAMING = True
+# Max wait for room in output queue for streamed blocks (seconds)
+OUTPUT_Q_TIMEOUT = 10
+# Max pending sentences synthesized in one batch
+BATCH_SIZE = 4
 
 # Text to speech class for robot01 project
 class TTS:	
 	# init
 	# ip = ip of robot01
-	def __init__(self, ip, output_q):
+	def __init__(self, ip, output_q, voice=voice):
 	
 		self.dest_ip = ip
 		self.output_q = output_q
 
-		# TTS_Model
-		self.tts_model = ROBOT_TTS_MODEL()
+		# TTS_Model, loaded by the worker thread so startup is not blocked
+		self.tts_model = None
+		self.loaded = False
+		self.load_lock = threading.Lock()
+		self.voice = voice
+		# Phrase cache, hits skip the model
+		self.cache = TTS_CACHE()
 		
 		#Queues
 		self.text_q = queue.Queue(maxsize=TEXT_Q_SIZE)
 		self.running = False
+		# Incremented on cancel, synthesis of an older generation is discarded
+		self.generation = 0
+
+		# Streaming synthesis mode
+		self.streaming = STREAMING
+		# Batch size for backed up text_q
+		self.batch_size = BATCH_SIZE
 		
 	# Generate Audio worker : Synthesises text from queue : output_q
 	# puts audio (16khz mono f32le) into output_q
@@ -29,21 +48,129 @@ class TTS:
 	def generate_speech(self):
 		
 		print("TTS Speech synthesizer worker started.")	
+		self.load()
 		
 		while self.running:
-			text = self.text_q.get()
+			texts = [self.text_q.get()]
 			if not self.running:
 				break
-			audio = self.tts_model.synthesize(text)
-			try:
-				self.output_q.put_nowait({"type" : "speech", "text" : text, "audio" : audio})
-			except Exception as e:
-				print("Output queue error : ", type(e).__name__ )
-			
-			self.text_q.task_done()
+
+			# Drain pending sentences for batched synthesis
+			while len(texts) < self.batch_size:
+				try:
+					texts.append(self.text_q.get_nowait())
+				except queue.Empty:
+					break
+
+			self.speak_texts([text for text in texts if text.strip() != ""])
+
+			for text in texts:
+				self.text_q.task_done()
 		
 		print("TTS Speech synthesizer worker stopped.")	
 
+	# Load TTS model (once)
+	#
+	def load(self):
+		with self.load_lock:
+			if not self.loaded:
+				self.tts_model = ROBOT_TTS_MODEL(self.voice)
+				# Invalid voices fall back to the default voice
+				self.voice = self.tts_model.voice
+				self.loaded = True
+				print("TTS model loaded")
+
+	# Change voice, cached phrases are keyed per voice
+	#
+	def set_voice(self, voice):
+		with self.load_lock:
+			if self.loaded:
+				self.tts_model.set_voice(voice)
+				voice = self.tts_model.voice
+			self.voice = voice
+
+	# Synthesize texts and put audio into output_q in original order.
+	# Cache hits skip the model, a single sentence is streamed, misses of a backlog are batched
+	#
+	def speak_texts(self, texts):
+		generation = self.generation
+		audios = [self.cache.get(text, self.voice) for text in texts]
+
+		# Leading cache hits can go out right away
+		while texts and audios[0] is not None:
+			self.put_output({"type" : "speech", "text" : texts.pop(0), "audio" : audios.pop(0)}, generation)
+
+		if not texts:
+			return
+
+		if self.streaming and len(texts) == 1:
+			self.stream_speech(texts[0], generation)
+			return
+
+		misses = [text for text, audio in zip(texts, audios) if audio is None]
+		synthesized = iter(self.tts_model.synthesize_batch(misses))
+
+		for text, audio in zip(texts, audios):
+			if not self.running or generation != self.generation:
+				return
+			if audio is None:
+				audio = next(synthesized)
+				self.cache.put(text, self.voice, audio)
+			self.put_output({"type" : "speech", "text" : text, "audio" : audio}, generation)
+
+	# Streaming : puts each synthesized block into output_q as soon as it is ready.
+	# Text is only attached to the first block, an audio-less final item marks the end of the utterance
+	#
+	def stream_speech(self, text, generation=None):
+		if generation is None:
+			generation = self.generation
+		blocks = []
+		output_action = {"type" : "speech", "text" : text, "final" : False}
+		for audio in self.tts_model.synthesize_stream(text):
+			if not self.running or generation != self.generation:
+				return
+			blocks.append(audio)
+			output_action['audio'] = audio
+			if not self.put_output(output_action, generation):
+				# Block dropped, the output worker closes the stalled stream
+				return
+			output_action = {"type" : "speech", "final" : False}
+
+		self.put_output({"type" : "speech", "final" : True}, generation)
+
+		if blocks:
+			self.cache.put(text, self.voice, np.concatenate(blocks))
+
+	# Put in output queue, waits for room as dropping a block would cut the utterance.
+	# The action is stamped with the generation it was synthesized for, the output worker drops older generations.
+	# Returns False when the action is not queued
+	#
+	def put_output(self, output_action, generation)->bool:
+		if generation != self.generation:
+			return False
+		output_action['generation'] = generation
+		try:
+			self.output_q.put(output_action, timeout=OUTPUT_Q_TIMEOUT)
+			return True
+		except Exception as e:
+			print("Output queue error : ", type(e).__name__ )
+			return False
+
+	# Cancel : discard pending texts and synthesis in progress
+	#
+	def cancel(self):
+		self.generation += 1
+		while True:
+			try:
+				self.text_q.get_nowait()
+				self.text_q.task_done()
+			except queue.Empty:
+				break
+
+	# True when no text is pending or being synthesized
+	def idle(self)->bool:
+		return self.text_q.unfinished_tasks == 0
+
 	# returns text_q size
 	def queue_size(self)->int:
 		return self.text_q.qsize()
@@ -1,22 +1,49 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from transformers import pipeline
-from datasets import load_dataset
-import torch
+import os
 import time
+import numpy as np
 
 device="cuda"
-voice=4830
+DEFAULT_VOICE = 4830
+voice=DEFAULT_VOICE
+
+TTS_MODEL_ID = "microsoft/speecht5_tts"
+VOCODER_ID = "microsoft/speecht5_hifigan"
+XVECTORS_DATASET = "Matthijs/cmu-arctic-xvectors"
+# Local artifact cache : speaker embeddings (.npy)
+ARTIFACT_DIR = "models/speecht5"
+# Load models from the local huggingface cache first, only download when missing
+OFFLINE_FIRST = True
+
+# Streaming : max words per synthesized block, shorter tails are merged into the previous block
+STREAM_BLOCK_WORDS = 8
+STREAM_MIN_WORDS = 3
+# Clause and sentence boundaries where a block may be cut early
+CLAUSE_BOUNDARIES = (",", ";", ":", "-", ".", "?", "!")
 
 # Text to speech model class for robot01 project
+# torch and transformers are imported when the model is loaded
 class ROBOT_TTS_MODEL:	
-	def __init__(self):	
+	def __init__(self, voice=voice):	
 		print("Loading TTS model")
+		import torch
+		from transformers import pipeline, SpeechT5HifiGan
+
+		self.torch = torch
+
+		# A vocoder passed to the pipeline is used as is, move it to the model device
+		vocoder = SpeechT5HifiGan.from_pretrained(model_path(VOCODER_ID)).to(device)
+		self.synthesiser = pipeline("text-to-speech", model_path(TTS_MODEL_ID), vocoder=vocoder, device=0)
+		self.set_voice(voice)
 
-		self.synthesiser = pipeline("text-to-speech", "microsoft/speecht5_tts", device=0)
-		embeddings_dataset = load_dataset("Matthijs/cmu-arctic-xvectors", split="validation")
-		self.speaker_embeddings = torch.tensor(embeddings_dataset[voice]["xvector"]).to(device).unsqueeze(0)	
+	# Select voice (x-vector index of the cmu-arctic-xvectors validation split)
+	#
+	def set_voice(self, voice):
+		voice = checked_voice(voice)
+		self.speaker_embeddings = self.torch.tensor(np.array(speaker_embedding(voice))).to(device).unsqueeze(0)
+		self.voice = voice
 
 	# Generate Audio worker : Synthesises text from queue : output_q
 	# puts audio (16khz mono f32le) into output_q
@@ -25,3 +52,118 @@ class ROBOT_TTS_MODEL:
 		synth_speech = self.synthesiser(text, forward_params={"speaker_embeddings": self.speaker_embeddings})
 		
 		return synth_speech['audio']
+
+	# Batched synthesis : one padded forward pass for several texts
+	# Returns list of audio (16khz mono f32le) trimmed to each texts own length, in order of texts
+	#
+	def synthesize_batch(self, texts)->list:
+		if len(texts) <= 1:
+			return [self.synthesize(text) for text in texts]
+
+		try:
+			inputs = self.synthesiser.tokenizer(texts, padding=True, return_tensors="pt").to(self.synthesiser.device)
+			with self.torch.no_grad():
+				waveforms, lengths = self.synthesiser.model.generate(
+					inputs["input_ids"],
+					attention_mask=inputs["attention_mask"],
+					speaker_embeddings=self.speaker_embeddings.repeat(len(texts), 1),
+					vocoder=self.synthesiser.vocoder,
+					return_output_lengths=True
+				)
+			waveforms = waveforms.float().cpu().numpy()
+			return [waveforms[i, :int(lengths[i])] for i in range(len(texts))]
+
+		except Exception as e:
+			# Fall back to one text per pipeline call
+			print("TTS batch synthesis error : ", e)
+			return [self.synthesize(text) for text in texts]
+
+	# Streaming synthesis : yields audio blocks (16khz mono f32le) per sub-sentence block
+	# as soon as each block is synthesized
+	#
+	def synthesize_stream(self, text):
+		for block in self.split_text(text):
+			yield self.synthesize(block)
+
+	# Split text into sub-sentence blocks on clause boundaries or word count
+	#
+	def split_text(self, text)->list:
+		blocks = []
+		words = []
+		for word in text.split():
+			words.append(word)
+			if len(words) >= STREAM_BLOCK_WORDS or (len(words) >= STREAM_MIN_WORDS and word.endswith(CLAUSE_BOUNDARIES)):
+				blocks.append(words)
+				words = []
+
+		if words:
+			# Very short blocks sound clipped, merge into previous block
+			if blocks and len(words) < STREAM_MIN_WORDS:
+				blocks[-1] = blocks[-1] + words
+			else:
+				blocks.append(words)
+
+		return [" ".join(block) for block in blocks]
+
+# Local path of a huggingface model, offline first
+#
+def model_path(repo_id)->str:
+	from huggingface_hub import snapshot_download
+
+	if OFFLINE_FIRST:
+		try:
+			return snapshot_download(repo_id, local_files_only=True)
+		except Exception:
+			print("TTS model " + repo_id + " not in local cache, downloading")
+
+	return snapshot_download(repo_id)
+
+# Voice when it is a valid x-vector index, else the default voice
+#
+def checked_voice(voice)->int:
+	if os.path.exists(voice_path(voice)):
+		return voice
+
+	count = len(all_xvectors())
+	if isinstance(voice, int) and 0 <= voice < count:
+		return voice
+
+	print("TTS voice " + str(voice) + " not found (0.." + str(count - 1) + "), using default voice " + str(DEFAULT_VOICE))
+	return DEFAULT_VOICE
+
+def voice_path(voice)->str:
+	return os.path.join(ARTIFACT_DIR, "xvector_" + str(voice) + ".npy")
+
+# All x-vectors from the artifact cache, memory-mapped. On a miss they are extracted from the dataset once (xvectors.npy)
+#
+def all_xvectors()->np.ndarray:
+	all_path = os.path.join(ARTIFACT_DIR, "xvectors.npy")
+	if not os.path.exists(all_path):
+		from datasets import load_dataset
+
+		print("Extracting speaker embeddings from " + XVECTORS_DATASET)
+		os.makedirs(ARTIFACT_DIR, exist_ok=True)
+		embeddings_dataset = load_dataset(XVECTORS_DATASET, split="validation")
+		save_npy(all_path, np.asarray(embeddings_dataset["xvector"], dtype=np.float32))
+
+	return np.load(all_path, mmap_mode="r")
+
+# Speaker embedding (x-vector) of voice from the artifact cache, memory-mapped.
+# On a miss the voice is taken from all x-vectors and stored as xvector_<voice>.npy
+#
+def speaker_embedding(voice)->np.ndarray:
+	path = voice_path(voice)
+	if os.path.exists(path):
+		return np.load(path, mmap_mode="r")
+
+	save_npy(path, np.asarray(all_xvectors()[voice], dtype=np.float32))
+
+	return np.load(path, mmap_mode="r")
+
+# Write .npy via a temp file, readers never see partial files
+#
+def save_npy(path, array):
+	tmp_path = path + ".tmp"
+	with open(tmp_path, "wb") as f:
+		np.save(f, array)
+	os.replace(tmp_path, path)
@@ -0,0 +1,133 @@
+import io
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Max cached vision results (LRU)
+MAX_ENTRIES = 64
+# Time a result stays valid (seconds)
+TTL = 60
+# Max hamming distance between frame hashes of the same scene (of 64 bits)
+HASH_DISTANCE = 6
+# Heading change invalidating a result (degrees)
+HEADING_CHANGE = 5
+
+# Class VISION_CACHE : vision model results keyed by perceptual hash of the frame + normalized prompt
+# Frames are hashed with a difference hash (dHash, 64 bits), frames of an unchanged scene hash within HASH_DISTANCE.
+# Entries expire after TTL, are evicted LRU beyond max_entries, and are invalidated by motion :
+#	invalidate() : called on body motion (walk/turn, see body_scheduler listeners)
+#	heading() : optional callable returning the current yaw (IMU), results are only valid at the same heading.
+#		When given, results are neither stored nor returned while the heading is unknown
+#
+class VISION_CACHE:
+	def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, heading=None):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.heading = heading
+
+		# key -> (frame hash, heading, time, result)
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+
+		# Metrics
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+		self.uncached = 0
+
+	#
+	# Normalize prompt : case, whitespace and surrounding punctuation do not change the question
+	#
+	def normalize(self, prompt)->str:
+		prompt = re.sub(r"\s+", " ", prompt.lower())
+		return prompt.strip(" .,?!;:'\"")
+
+	#
+	# Perceptual hash (dHash) of JPEG frame, falls back to a content hash when Pillow is not available
+	#
+	def frame_hash(self, jpeg)->int:
+		try:
+			from PIL import Image
+			image = Image.open(io.BytesIO(jpeg)).convert("L").resize((9, 8))
+			pixels = list(image.getdata())
+		except ImportError:
+			return int.from_bytes(hashlib.sha1(jpeg).digest()[:8], "big")
+
+		bits = 0
+		for row in range(8):
+			for col in range(8):
+				bits = (bits << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+		return bits
+
+	#
+	# Current heading, None when unknown
+	#
+	def current_heading(self)-> any:
+		if self.heading is None:
+			return None
+		try:
+			return float(self.heading())
+		except Exception:
+			return None
+
+	#
+	# Get result for frame and prompt, returns None on miss
+	#
+	def get(self, jpeg, prompt)-> any:
+		frame_hash = self.frame_hash(jpeg)
+		heading = self.current_heading()
+		prompt = self.normalize(prompt)
+		now = time.monotonic()
+
+		with self.lock:
+			# Heading unknown, cached results can not be validated
+			if self.heading is not None and heading is None:
+				self.misses += 1
+				return None
+
+			for key, (entry_hash, entry_heading, entry_time, result) in list(self.entries.items()):
+				if now - entry_time > self.ttl:
+					del self.entries[key]
+					continue
+				if key[0] != prompt or bin(entry_hash ^ frame_hash).count("1") > HASH_DISTANCE:
+					continue
+				if heading is not None and abs((heading - entry_heading + 180) % 360 - 180) > HEADING_CHANGE:
+					continue
+
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return result
+
+			self.misses += 1
+		return None
+
+	#
+	# Store result for frame and prompt
+	#
+	def put(self, jpeg, prompt, result):
+		heading = self.current_heading()
+		key = (self.normalize(prompt), self.frame_hash(jpeg))
+		with self.lock:
+			# Heading unknown (stale IMU reading), a later turn could not be detected
+			if self.heading is not None and heading is None:
+				self.uncached += 1
+				return
+			self.entries[key] = (key[1], heading, time.monotonic(), result)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_entries:
+				self.entries.popitem(last=False)
+
+	#
+	# Invalidate all results (robot moved)
+	#
+	def invalidate(self, *args):
+		with self.lock:
+			if self.entries:
+				self.invalidations += 1
+			self.entries.clear()
+
+	def stats(self)->dict:
+		with self.lock:
+			return { "entries" : len(self.entries), "hits" : self.hits, "misses" : self.misses, "invalidations" : self.invalidations, "uncached" : self.uncached }